@@ -0,0 +1,182 @@
+import numpy as np
+
+from methods import GaussianBeam, GaussianBeamArray
+
+
+# Ray transfer matrix of free space propagation over distance d in [mm]
+def free_space(d: float):
+    return np.array([[1.0, d], [0.0, 1.0]])
+
+
+# Ray transfer matrix of a thin lens (or mirror) with focal length f in [mm]
+def thin_lens(f: float):
+    return np.array([[1.0, 0.0], [-1.0 / f, 1.0]])
+
+
+# Complex beam parameter q = (z - waist_position) + i * zR of a beam at position z in [mm]
+def q_parameter(beam, z: float):
+    return (z - beam.waist_position) + 1j * beam.zR
+
+
+# Gaussian beam(s) described by complex beam parameter(s) q at position z in [mm],
+# with the given dtype (the methods dtype policy by default)
+def beam_from_q(q, z: float, wavelength, dtype=None):
+    zR = np.imag(q)
+    if np.any(zR <= 0):
+        raise Exception("Complex beam parameter does not describe a physical beam.")
+    waist = np.sqrt(wavelength * zR / np.pi)
+    waist_position = z - np.real(q)
+    if np.ndim(q) == 0 and np.ndim(wavelength) == 0:
+        return GaussianBeam(wavelength, waist, waist_position, dtype)
+    return GaussianBeamArray(wavelength, waist, waist_position, dtype)
+
+
+# Transform complex beam parameter(s) q with a ray transfer matrix M.
+# All q values are propagated with a single matrix product on [q, 1] vectors.
+def apply_matrix(M, q):
+    q = np.asarray(q, dtype=complex)
+    v = M @ np.vstack([q.ravel(), np.ones(q.size)])
+    return (v[0] / v[1]).reshape(q.shape)
+
+
+class BeamTrain:
+    def __init__(self, elements: list):
+        # Lenses and mirrors ordered by their position in space
+        self.elements = sorted(elements, key=lambda e: e.position)
+        # System matrices cached per (start, end) pair
+        self._matrices = {}
+
+    # Element ray transfer matrix
+    @staticmethod
+    def element_matrix(element):
+        return thin_lens(element.focal_length)
+
+    # Ray transfer matrix from plane start to plane end in [mm] including all
+    # elements with start <= position <= end
+    def system_matrix(self, start: float = None, end: float = None):
+        if start is None:
+            start = self.elements[0].position
+        if end is None:
+            end = self.elements[-1].position
+        if end < start:
+            raise Exception("End of the train positioned before its start.")
+        key = (float(start), float(end))
+        if key not in self._matrices:
+            M = np.eye(2)
+            z = start
+            for element in self.elements:
+                if start <= element.position <= end:
+                    M = self.element_matrix(element) @ free_space(element.position - z) @ M
+                    z = element.position
+            self._matrices[key] = free_space(end - z) @ M
+        return self._matrices[key]
+
+    # Beam(s) at plane end after passing the train, for beam(s) incident at plane start.
+    # By default the whole train is used, i.e. the output beam after the last element.
+    def propagate(self, beam, end: float = None, start: float = None):
+        if start is None:
+            start = self.elements[0].position
+        if end is None:
+            end = self.elements[-1].position
+        q = apply_matrix(self.system_matrix(start, end), q_parameter(beam, start))
+        return beam_from_q(q, end, beam.wavelength, beam.dtype)
+
+    # Beams in every segment of the train: the input beam followed by the beam
+    # after each element, all in the dtype of the input beam
+    def segments(self, beam):
+        beams = [beam]
+        for element in self.elements:
+            q = apply_matrix(self.element_matrix(element), q_parameter(beams[-1], element.position))
+            beams.append(beam_from_q(q, element.position, beam.wavelength, beam.dtype))
+        return beams
+
+
+# Focal length of an element along the given axis ("sagittal" or "tangential").
+# Lenses have the same focal length on both axes.
+def element_focal_length(element, axis: str = "sagittal"):
+    return getattr(element, axis + "_focal_length", element.focal_length)
+
+
+# Derivative of the focal length along axis with respect to an element parameter
+def _focal_length_derivative(element, name: str, axis: str):
+    if name == "position":
+        return 0.0
+    if not hasattr(element, "incidence_angle"):
+        if name == "focal_length":
+            return 1.0
+        raise Exception("Unknown lens parameter: " + name)
+    a = element.incidence_angle
+    if axis == "tangential":
+        derivatives = {"R": np.cos(a) / 2, "r": 0.0, "incidence_angle": -element.R * np.sin(a) / 2}
+    else:
+        derivatives = {"R": 0.0, "r": 1 / 2 / np.cos(a), "incidence_angle": element.r * np.sin(a) / 2 / np.cos(a)**2}
+    if name not in derivatives:
+        raise Exception("Unknown mirror parameter: " + name)
+    return derivatives[name]
+
+
+# Forward mode propagation of the complex beam parameter through a chain of
+# elements (ordered by position) together with its derivatives with respect to
+# element parameters, given as (element index, parameter name) pairs with names
+# focal_length (Lens), R, r, incidence_angle (ToroidalMirror) or position.
+# Returns q just before every element (N,), its derivatives (N, P), and q with
+# derivatives at the fixed plane end (by default the current position of the
+# last element, just after it).
+def propagate_with_gradient(beam, elements: list, parameters: list, axis: str = "sagittal", end: float = None):
+    positions = [e.position for e in elements]
+    if any(b < a for a, b in zip(positions, positions[1:])):
+        raise Exception("Elements must be ordered by position.")
+    if end is None:
+        end = positions[-1]
+
+    def position_derivative(k):
+        return np.array([1.0 if (i == k and name == "position") else 0.0 for i, name in parameters])
+
+    q = complex(q_parameter(beam, positions[0]))
+    dq = position_derivative(0).astype(complex)
+    q_in = np.empty(len(elements), dtype=complex)
+    dq_in = np.empty((len(elements), len(parameters)), dtype=complex)
+    for k, element in enumerate(elements):
+        if k > 0:
+            q = q + positions[k] - positions[k - 1]
+            dq = dq + position_derivative(k) - position_derivative(k - 1)
+        q_in[k] = q
+        dq_in[k] = dq
+
+        f = element_focal_length(element, axis)
+        df = np.array([_focal_length_derivative(element, name, axis) if i == k else 0.0 for i, name in parameters])
+        # Thin lens: q' = q f / (f - q)
+        dq = (f**2 * dq - q**2 * df) / (f - q)**2
+        q = q * f / (f - q)
+
+    q = q + end - positions[-1]
+    dq = dq - position_derivative(len(elements) - 1)
+    return q_in, dq_in, q, dq
+
+
+# Waist and waist position in [mm] of the beam with parameter q at plane z,
+# with their derivatives for derivatives dq and dz of q and of the plane position
+def waist_with_gradient(q, dq, wavelength: float, z: float, dz=0.0):
+    waist = np.sqrt(wavelength * np.imag(q) / np.pi)
+    dwaist = waist / 2 / np.imag(q) * np.imag(dq)
+    return waist, dwaist, z - np.real(q), dz - np.real(dq)
+
+
+# Squared beam radius in [mm^2] for beam parameters q, with derivatives for dq.
+# q may have shape (N,) with dq of shape (N, P).
+def radius_squared_with_gradient(q, dq, wavelength: float):
+    a, b = np.real(q), np.imag(q)
+    w2 = wavelength * (a**2 + b**2) / np.pi / b
+    a, b = np.expand_dims(a, -1), np.expand_dims(b, -1)
+    dw2 = wavelength / np.pi * ((2 * a * np.real(dq) + 2 * b * np.imag(dq)) / b - (a**2 + b**2) * np.imag(dq) / b**2)
+    return w2, dw2
+
+
+# Power transmitted through apertures of radius r for squared beam radii w2,
+# with derivatives for dw2
+def transmission_with_gradient(r, w2, dw2):
+    r = np.asarray(r, dtype=float)
+    E = np.exp(-2 * r**2 / w2)
+    T = -np.expm1(-2 * r**2 / w2)
+    dT = -np.expand_dims(E * 2 * r**2 / w2**2, -1) * dw2
+    return T, dT
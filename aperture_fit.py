@@ -0,0 +1,67 @@
+import numpy as np
+
+from methods import airy_diameter
+from detectors import Detector, angular_efficiency, aperture_overlap
+
+
+class ApertureFit:
+    def __init__(self, detector: Detector, wavelength: float, optics_diameter: float,
+                 focal_lengths=None, fit_range: tuple = (100, 400)):
+        if focal_lengths is None:
+            focal_lengths = np.linspace(1, 1000, 1000)
+        self.detector = detector
+        # Wavelength of radiation in [mm]
+        self.wavelength = wavelength
+        # Diameter of the focusing optics in [mm]
+        self.optics_diameter = optics_diameter
+        # Simulated focal lengths in [mm]
+        self.focal_lengths = np.asarray(focal_lengths, dtype=float)
+        # Only experimental points with focal lengths in this range are fitted
+        self.fit_range = fit_range
+
+        self.airy_diameters = airy_diameter(wavelength, self.focal_lengths, optics_diameter)
+        self.angular_efficiency = angular_efficiency(detector, self.focal_lengths, optics_diameter)
+
+        f = detector.experiment_focal_lengths()
+        self._valid = (fit_range[0] <= f) & (f <= fit_range[1])
+        if not np.any(self._valid):
+            raise Exception("No experimental points of " + detector.name + " within the fit range.")
+        f = f[self._valid]
+
+        # Linear interpolation onto the experimental focal lengths (as np.interp) reduces
+        # to a fixed pair of neighbouring grid points and weights, computed once
+        i = np.clip(np.searchsorted(self.focal_lengths, f, side="right") - 1, 0, len(self.focal_lengths) - 2)
+        t = np.clip((f - self.focal_lengths[i]) / (self.focal_lengths[i + 1] - self.focal_lengths[i]), 0, 1)
+        self._index = np.stack([i, i + 1])
+        self._weight = np.stack([1 - t, t])
+
+    def targets(self, scaling_factor: float = None):
+        return self.detector.experiment_efficiencies(scaling_factor)[self._valid]
+
+    # Mean squared error between the model and the experiment for every aperture
+    def losses(self, apertures, scaling_factor: float = None):
+        apertures = np.asarray(apertures, dtype=float)
+        overlap = aperture_overlap(apertures[..., None, None], self.airy_diameters[self._index])
+        model = np.sum(self._weight * self.angular_efficiency[self._index] * overlap, axis=-2)
+        return np.mean((model - self.targets(scaling_factor))**2, axis=-1)
+
+    # Best detector aperture in [mm] and its loss. The grid minimum is refined
+    # with a bounded scalar optimizer within the neighbouring grid cells.
+    def fit(self, apertures=None, scaling_factor: float = None):
+        if apertures is None:
+            apertures = np.linspace(5, 20, 100)
+        apertures = np.asarray(apertures, dtype=float)
+        losses = self.losses(apertures, scaling_factor)
+        i = int(np.argmin(losses))
+        bounds = (apertures[max(i - 1, 0)], apertures[min(i + 1, len(apertures) - 1)])
+        if bounds[0] == bounds[1]:
+            return apertures[i], losses[i]
+        from scipy.optimize import minimize_scalar
+        result = minimize_scalar(lambda a: self.losses(a, scaling_factor), bounds=bounds, method="bounded")
+        if result.fun > losses[i]:
+            return apertures[i], losses[i]
+        return float(result.x), float(result.fun)
+
+    # Total efficiency for every simulated focal length with the given aperture
+    def efficiency(self, aperture: float):
+        return self.angular_efficiency * aperture_overlap(aperture, self.airy_diameters)
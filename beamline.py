@@ -0,0 +1,156 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from methods import GaussianBeam, GaussianBeamArray, Lens, ToroidalMirror
+import methods
+import abcd
+from abcd import BeamTrain
+from results import config_key, source_version
+
+ELEMENT_TYPES = {
+    "Lens": Lens,
+    "ToroidalMirror": ToroidalMirror,
+}
+
+
+class Beamline:
+    def __init__(self, source: GaussianBeam, elements: list):
+        # Beam incident on the first element
+        self.source = source
+        # Lenses and mirrors ordered by their position in space
+        self.elements = sorted(elements, key=lambda e: e.position)
+        self.train = BeamTrain(self.elements)
+        self._positions = np.array([e.position for e in self.elements], dtype=float)
+        # Beams in every segment (source followed by the beam after each element),
+        # filled by compile()
+        self.beams = None
+
+    def compile(self):
+        self.beams = GaussianBeamArray.from_beams(self.train.segments(self.source))
+        return self
+
+    # Beam after the last element
+    def output(self):
+        if self.beams is None:
+            self.compile()
+        return self.beams[len(self.beams) - 1]
+
+    # Segment index of every position z in [mm]: 0 before the first element,
+    # i behind the i-th element
+    def segment(self, z):
+        return np.searchsorted(self._positions, z, side="right")
+
+    # 1/e2 beam radius in [mm] at positions z in any order, spanning any number
+    # of segments. The beamline is compiled on the first query.
+    def radius(self, z):
+        if self.beams is None:
+            self.compile()
+        i = self.segment(z)
+        z = np.asarray(z, dtype=self.beams.dtype)
+        # w^2 = w0^2 + (w0 / zR)^2 (z - z0)^2, evaluated in place
+        r = z - self.beams.waist_position[i]
+        r *= r
+        r *= (self.beams.waist / self.beams.zR)[i] ** 2
+        r += (self.beams.waist ** 2)[i]
+        return np.sqrt(r)
+
+    def power_through_aperture(self, r, z):
+        if self.beams is None:
+            self.compile()
+        return -np.expm1(-2 * np.asarray(r, dtype=self.beams.dtype) ** 2 / self.radius(z) ** 2)
+
+    # Plot every segment on a plotting.Plotter, a new one by default
+    def plot(self, plotter=None, end: float = None):
+        if self.beams is None:
+            self.compile()
+        if plotter is None:
+            from plotting import Plotter
+            plotter = Plotter()
+        if end is None:
+            end = self.elements[-1].position + 1000
+        edges = [min(0, self.source.waist_position)] + [e.position for e in self.elements] + [end]
+        for i, beam in enumerate(self.beams):
+            plotter.add_beam(beam, edges[i], edges[i + 1])
+            if i < len(self.elements):
+                element = self.elements[i]
+                if isinstance(element, ToroidalMirror):
+                    plotter.add_mirror(element)
+                else:
+                    plotter.add_lens(element)
+        return plotter
+
+
+# Parse a beamline description from a .json, .toml or .yaml file
+def read_beamline_file(path):
+    suffix = Path(path).suffix.lower()
+    if suffix == ".json":
+        with open(path) as f:
+            return json.load(f)
+    if suffix == ".toml":
+        import tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    if suffix in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise Exception("PyYAML is required to read YAML beamline files.")
+        with open(path) as f:
+            return yaml.safe_load(f)
+    raise Exception("Unsupported beamline file format: " + suffix)
+
+
+# Build a Beamline from a description:
+#   source: wavelength, waist, waist_position (as GaussianBeam)
+#   elements: list of {type: Lens | ToroidalMirror, <constructor arguments>}
+def build_beamline(config: dict):
+    source = GaussianBeam(**config["source"])
+    elements = []
+    for entry in config.get("elements", []):
+        params = dict(entry)
+        kind = params.pop("type")
+        if kind not in ELEMENT_TYPES:
+            raise Exception("Unknown beamline element type: " + str(kind))
+        elements.append(ELEMENT_TYPES[kind](**params))
+    if not elements:
+        raise Exception("Beamline contains no elements.")
+    return Beamline(source, elements)
+
+
+# Content hash of a beamline description and of the code compiling it, so
+# cached beamlines are recompiled when the model changes
+def config_hash(config: dict):
+    model = source_version([methods, abcd, sys.modules[__name__]])
+    return config_key({"model": model, "config": config})
+
+
+# Build and compile a beamline. Compiled segment beams are cached in cache_dir
+# under the content hash of the description, so unchanged beamlines are not
+# recomputed. cache_dir=None disables the cache.
+def compile_beamline(config: dict, cache_dir: str = "outs/cache/beamlines"):
+    beamline = build_beamline(config)
+    if cache_dir is None:
+        return beamline.compile()
+
+    # Beams compiled in float32 and float64 are cached separately
+    dtype = beamline.source.dtype
+    path = os.path.join(cache_dir, config_hash(config) + "_" + np.dtype(dtype).name + ".npz")
+    if os.path.exists(path):
+        with np.load(path) as data:
+            beamline.beams = GaussianBeamArray(data["wavelength"], data["waist"], data["waist_position"], dtype)
+        return beamline
+
+    beamline.compile()
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    tmp = path + "." + str(os.getpid()) + ".tmp.npz"
+    np.savez(tmp, wavelength=beamline.beams.wavelength, waist=beamline.beams.waist, waist_position=beamline.beams.waist_position)
+    os.replace(tmp, path)
+    return beamline
+
+
+def load_beamline(path, cache_dir: str = "outs/cache/beamlines"):
+    return compile_beamline(read_beamline_file(path), cache_dir)
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+from methods import GaussianBeam, Lens, ToroidalMirror, EllipticalBeam, GaussianDistribution, precision
+from detectors import DETECTORS
+from aperture_fit import ApertureFit
+
+# Benchmarks of the hot paths in methods.py and of end-to-end cases modelled on
+# the scripts, and import times of the modules used by batch workers, which must
+# not load matplotlib or scipy. Usage:
+#   python benchmarks.py --save          store the baseline
+#   python benchmarks.py                 compare with the baseline, exit code 1 on regression
+# Timings depend on the machine, so the baseline is kept locally; the pytest
+# suite (tests/test_benchmarks.py) runs every case once at its smallest size.
+
+BASELINE = "outs/benchmarks/baseline.json"
+SIZES = [1, 10**3, 10**5, 10**7]
+
+# Modules imported by batch workers and the packages they must not load
+WORKER_MODULES = ["methods", "abcd", "detectors", "aperture_fit", "sweep", "beamline", "link_budget", "cli"]
+HEAVY_PACKAGES = ["matplotlib", "scipy"]
+
+
+def _beam():
+    return GaussianBeam(3.15, 5.6, 0)
+
+
+def _radius(n):
+    beam = _beam()
+    z = np.linspace(0, 10**5, n)
+    return lambda: beam.radius(z)
+
+
+def _power_through_aperture(n):
+    beam = _beam()
+    z = np.linspace(0, 10**5, n)
+    return lambda: beam.power_through_aperture(187 / 2, z)
+
+
+def _lens_transform(n):
+    beam = _beam()
+    lens = Lens(np.linspace(1, 1000, n) if n > 1 else 350.0, 187, 350)
+    return lambda: lens.transform(beam)
+
+
+def _mirror_transform(n):
+    beam = GaussianBeam(0.6, 6.2, 0)
+    mirror = ToroidalMirror(1099.8, np.linspace(400, 700, n) if n > 1 else 549.9, np.pi / 4, 100, 1280)
+    return lambda: mirror.transform(beam)
+
+
+def _mirror_transform_elliptical(n):
+    beam = EllipticalBeam(0.6, 6.2, 5.0, 0, 10)
+    mirror = ToroidalMirror(1099.8, 549.9, np.pi / 4, 100, 1280)
+    return lambda: mirror.transform(beam)
+
+
+def _overlap(n):
+    acceptance = GaussianDistribution(15, 8.5 / 1.699)
+    diameters = 2 * np.rad2deg(np.arctan(187 / 2 / np.linspace(1, 1000, n)))
+    return lambda: acceptance.overlap(15, diameters)
+
+
+def _overlap_numeric(n):
+    acceptance = GaussianDistribution(15, 8.5 / 1.699)
+    return lambda: acceptance.overlap_numeric(15, 20)
+
+
+def _add_beam(n):
+    # 20 m segment at 1 mm spacing as in simulation.py; matplotlib is only
+    # loaded by this case
+    from plotting import Plotter
+    beam = _beam()
+    plotter = Plotter()
+
+    def run():
+        plotter.add_beam(beam, 0, 20000)
+        plotter.axes.lines[-1].remove()
+    return run
+
+
+def _detector_efficiency(n):
+    # Aperture fit of all four detectors as in detector_efficiency.py
+    def run():
+        for detector in DETECTORS:
+            ApertureFit(detector, 3.15, 187).fit()
+    return run
+
+
+def _losses_vs_distance(n):
+    # Loss scan behind the first lens as in losses_vs_distance.py
+    beam = Lens(350, 187, 350).transform(_beam())
+    z = np.linspace(350, 10**5, n)
+    return lambda: beam.power_through_aperture(187 / 2, z)
+
+
+def _losses_vs_distance_float32(n):
+    with precision(np.float32):
+        beam = Lens(350, 187, 350).transform(_beam())
+    z = np.linspace(350, 10**5, n, dtype=np.float32)
+    return lambda: beam.power_through_aperture(187 / 2, z)
+
+
+# name -> (case factory, sizes)
+CASES = {
+    "radius": (_radius, SIZES),
+    "power_through_aperture": (_power_through_aperture, SIZES),
+    "lens_transform": (_lens_transform, SIZES),
+    "mirror_transform": (_mirror_transform, SIZES),
+    "mirror_transform_elliptical": (_mirror_transform_elliptical, [1]),
+    "overlap": (_overlap, SIZES),
+    "overlap_numeric": (_overlap_numeric, [1]),
+    "plotter_add_beam": (_add_beam, [20000]),
+    "detector_efficiency": (_detector_efficiency, [1]),
+    "losses_vs_distance": (_losses_vs_distance, [10**3, 10**7]),
+    "losses_vs_distance_float32": (_losses_vs_distance_float32, [10**3, 10**7]),
+}
+
+
+# Best time per call in [s] over several repeats
+def measure(function, repeat: int = 5):
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(pattern: str = None, repeat: int = 5):
+    results = {}
+    for name, (factory, sizes) in CASES.items():
+        for n in sizes:
+            key = name + "[" + str(n) + "]"
+            if pattern and pattern not in key:
+                continue
+            results[key] = measure(factory(n), repeat)
+            print(f"{key:45s} {results[key] * 1e6:14.2f} us")
+    return results
+
+
+# Best import time in [s] of a module in a fresh interpreter and the heavy
+# packages loaded by the import
+def import_time(module: str, repeat: int = 5):
+    code = ("import sys, time; t = time.perf_counter(); import " + module + "; t = time.perf_counter() - t; "
+            "print(t, *[p for p in " + repr(HEAVY_PACKAGES) + " if p in sys.modules])")
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(output[0]))
+    return min(times), output[1:]
+
+
+# Import times of the worker modules and the heavy packages each of them loads
+def run_imports(pattern: str = None, repeat: int = 5):
+    results, heavy = {}, {}
+    for module in WORKER_MODULES:
+        key = "import[" + module + "]"
+        if pattern and pattern not in key:
+            continue
+        results[key], loaded = import_time(module, repeat)
+        print(f"{key:45s} {results[key] * 1e6:14.2f} us")
+        if loaded:
+            heavy[module] = loaded
+    return results, heavy
+
+
+# Cases slower than the baseline by more than the threshold (relative)
+def regressions(results: dict, baseline: dict, threshold: float):
+    slower = {}
+    for key, time in results.items():
+        if key in baseline and time > baseline[key] * (1 + threshold):
+            slower[key] = time / baseline[key]
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the Gaussian beam methods.")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline results file")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--filter", default=None, help="run only cases containing this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, args.repeat)
+    import_results, heavy = run_imports(args.filter, args.repeat)
+    results.update(import_results)
+    for module, packages in heavy.items():
+        print("HEAVY IMPORT " + module + ": loads " + ", ".join(packages))
+
+    if args.save:
+        Path(os.path.dirname(args.baseline)).mkdir(parents=True, exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": platform.node(), "python": platform.python_version(),
+                       "numpy": np.__version__, "results": results}, f, indent=2)
+        print("Baseline saved to " + args.baseline)
+        return 1 if heavy else 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found at " + args.baseline + ", run with --save first.")
+        return 1 if heavy else 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    slower = regressions(results, baseline, args.threshold)
+    for key, ratio in slower.items():
+        print(f"REGRESSION {key}: {ratio:.2f}x slower than baseline")
+    return 1 if slower or heavy else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+import argparse
+import importlib
+import itertools
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from methods import GaussianBeam, Lens
+from detectors import DETECTORS, total_efficiency
+from aperture_fit import ApertureFit
+from beamline import read_beamline_file, build_beamline
+from link_budget import link_budget, loss_db
+from results import ResultStore, config_key, source_version
+
+# Batch driver for the analyses of the scripts. Every parameter takes a list of
+# values or start:stop:num ranges, on the command line or in a .json, .toml or
+# .yaml grid file; the cartesian product of all lists is a grid of jobs run on
+# a local process pool. Results are stored in <out>/results and every finished
+# job is appended to <out>/progress.jsonl, so an interrupted run continues with
+# the jobs that are still missing. Usage:
+#   python cli.py losses --diameter 100 150 187 --scan-range 1e5
+#   python cli.py detector-efficiency --detector Alvidas bareWG --optics-diameter 25:300:12
+#   python cli.py toroidal --beamline beamlines/polfel_tm5.toml --wavelength 0.3 0.6 --plot
+
+OUT = "outs/batch"
+
+# Focal lengths in [mm] scanned by the detector efficiency analyses
+FOCAL_LENGTHS = np.linspace(1, 1000, 1000)
+
+DETECTOR_NAMES = {detector.name: detector for detector in DETECTORS}
+
+# Hash of the model code and of the job functions in this file; jobs run with
+# other code are run again
+MODEL_VERSION = source_version([importlib.import_module(name) for name in
+                                ("methods", "detectors", "aperture_fit", "beamline", "link_budget", "abcd")]
+                               + [sys.modules[__name__]])
+
+
+# Two lens emitter of simulation.py: output beam and transmission of both lenses
+def simulation_job(p: dict, plot_path: str = None):
+    beam1 = GaussianBeam(p["wavelength"], p["source_waist"], 0)
+    lens1 = Lens(p["f1"], p["d1"], p["l1_position"])
+    beam2 = lens1.transform(beam1)
+    lens2 = Lens(p["f2"], p["d2"], p["l2_position"])
+    beam3 = lens2.transform(beam2)
+    if plot_path is not None:
+        from plotting import Plotter
+        plot = Plotter()
+        plot.add_beam(beam1, 0, lens1.position)
+        plot.add_lens(lens1)
+        plot.add_transmission(beam1, lens1)
+        plot.add_beam(beam2, lens1.position, lens2.position)
+        plot.add_lens(lens2)
+        plot.add_transmission(beam2, lens2)
+        plot.add_beam(beam3, lens2.position, p["distance"])
+        plot.save(plot_path + ".svg")
+    return {
+        "waist": beam3.waist,
+        "waist_position": beam3.waist_position,
+        "T1": beam1.power_through_aperture(lens1.diameter / 2, lens1.position),
+        "T2": beam2.power_through_aperture(lens2.diameter / 2, lens2.position),
+        "radius": beam3.radius(p["distance"]),
+    }
+
+
+# Transmission through an aperture behind a collimating lens vs distance (losses_vs_distance.py)
+def losses_job(p: dict, plot_path: str = None):
+    beam1 = GaussianBeam(p["wavelength"], p["source_waist"], 0)
+    lens1 = Lens(p["lens_position"], p["diameter"], p["lens_position"])
+    beam2 = lens1.transform(beam1)
+    z = np.arange(p["lens_position"], p["scan_range"], p["step"])
+    T = beam2.power_through_aperture(p["diameter"] / 2, z)
+    if plot_path is not None:
+        axes = _figure_axes('Distance [m]', 'Relative transmitted power')
+        axes.semilogy(z / 1000, T)
+        _save_figure(axes, plot_path)
+    return {"z": z, "transmission": T, "final_loss_db": loss_db(T[-1])}
+
+
+# Efficiency vs focal length with the detector aperture fitted to the measured points (detector_efficiency.py)
+def detector_efficiency_job(p: dict, plot_path: str = None):
+    detector = _detector(p["detector"])
+    aperture, loss = ApertureFit(detector, p["wavelength"], p["optics_diameter"], FOCAL_LENGTHS).fit()
+    return _efficiency_result(detector, p, aperture, plot_path, best_loss=loss)
+
+
+# Efficiency vs focal length for a given detector aperture (focusing_optimization.py)
+def focusing_job(p: dict, plot_path: str = None):
+    detector = _detector(p["detector"])
+    aperture = detector.aperture if p["aperture"] is None else p["aperture"]
+    return _efficiency_result(detector, p, aperture, plot_path)
+
+
+# Output beam and clipping losses of a beamline file (toroidal_mirrors_simulation.py).
+# wavelength in [mm] replaces the wavelength of the source unless None.
+def toroidal_job(p: dict, plot_path: str = None):
+    config = dict(p["beamline_config"])
+    if p["wavelength"] is not None:
+        config["source"] = dict(config["source"], wavelength=p["wavelength"])
+    beamline = build_beamline(config).compile()
+    output = beamline.output()
+    budget = link_budget(beamline.source, beamline.elements)
+    if plot_path is not None:
+        beamline.plot().save(plot_path + ".svg")
+    return {
+        "waist": output.waist,
+        "waist_position": output.waist_position,
+        "radius": budget["radius"],
+        "element_loss_db": budget["element_loss_db"],
+        "total_loss_db": budget["cumulative_loss_db"][-1],
+    }
+
+
+def _detector(name: str):
+    if name not in DETECTOR_NAMES:
+        raise Exception("Unknown detector " + name + ", expected one of " + ", ".join(DETECTOR_NAMES))
+    return DETECTOR_NAMES[name]
+
+
+def _efficiency_result(detector, p: dict, aperture: float, plot_path: str = None, **extra):
+    efficiency = total_efficiency(detector, p["wavelength"], FOCAL_LENGTHS, p["optics_diameter"], aperture)
+    index_max = np.argmax(efficiency)
+    if plot_path is not None:
+        axes = _figure_axes('Focal length [mm]', 'Efficiency')
+        axes.plot(FOCAL_LENGTHS, efficiency, label='Total efficiency')
+        axes.scatter(detector.experiment_focal_lengths(), detector.experiment_efficiencies(), color='purple', label='Experimental data')
+        axes.legend()
+        _save_figure(axes, plot_path)
+    return {"aperture": aperture, "best_focal_length": FOCAL_LENGTHS[index_max],
+            "max_efficiency": efficiency[index_max], "efficiency": efficiency, **extra}
+
+
+def _figure_axes(xlabel: str, ylabel: str):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    figure = Figure(figsize=(8, 5))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.set_xlabel(xlabel)
+    axes.set_ylabel(ylabel)
+    axes.grid(True)
+    return axes
+
+
+def _save_figure(axes, path: str):
+    axes.figure.tight_layout()
+    axes.figure.savefig(path + ".svg")
+
+
+# Subcommands as (job function, description, parameters). Parameters are
+# (name, type, default values, help); lengths in [mm].
+COMMANDS = {
+    "simulation": (simulation_job, "Two lens emitter", [
+        ("wavelength", float, [3.15], "wavelength"),
+        ("source_waist", float, [5.6], "waist of the source"),
+        ("f1", float, [-33.33], "focal length of the first lens"),
+        ("d1", float, [27], "diameter of the first lens"),
+        ("l1_position", float, [50], "position of the first lens"),
+        ("f2", float, [120], "focal length of the second lens"),
+        ("d2", float, [187], "diameter of the second lens"),
+        ("l2_position", float, [148], "position of the second lens"),
+        ("distance", float, [20000], "distance at which the beam radius is evaluated"),
+    ]),
+    "losses": (losses_job, "Transmission vs distance behind a collimating lens", [
+        ("wavelength", float, [3.15], "wavelength"),
+        ("source_waist", float, [5.6], "waist of the source"),
+        ("diameter", float, [187], "diameter of the lens and of the receiving aperture"),
+        ("lens_position", float, [350], "position and focal length of the lens"),
+        ("scan_range", float, [10**5], "end of the scan"),
+        ("step", float, [100], "step of the scan"),
+    ]),
+    "detector-efficiency": (detector_efficiency_job, "Detector efficiency with fitted aperture", [
+        ("detector", str, ["bareWG"], "detector name: " + ", ".join(DETECTOR_NAMES)),
+        ("wavelength", float, [3.15], "wavelength"),
+        ("optics_diameter", float, [187], "diameter of the focusing optics"),
+    ]),
+    "focusing": (focusing_job, "Focusing and detection efficiency", [
+        ("detector", str, ["Alvidas"], "detector name: " + ", ".join(DETECTOR_NAMES)),
+        ("wavelength", float, [3.15], "wavelength"),
+        ("optics_diameter", float, [187], "diameter of the focusing optics"),
+        ("aperture", float, [None], "detector aperture, the detector's own by default"),
+    ]),
+    "toroidal": (toroidal_job, "Beamline of toroidal mirrors and lenses", [
+        ("beamline", str, ["beamlines/polfel_tm5.toml"], "beamline file"),
+        ("wavelength", float, [None], "wavelength, the source's own by default"),
+    ]),
+}
+
+
+# Values of one parameter; numbers may be given as start:stop:num ranges
+def parse_values(values: list, kind=float):
+    result = []
+    for value in values:
+        if kind is float and isinstance(value, str) and ":" in value:
+            start, stop, num = value.split(":")
+            result += np.linspace(float(start), float(stop), int(num)).tolist()
+        elif kind is float and value is not None:
+            result.append(float(value))
+        else:
+            result.append(value)
+    return result
+
+
+# Grid of parameter lists: command line values, then the grid file, then defaults
+def parameter_grid(command: str, args: argparse.Namespace):
+    _, _, parameters = COMMANDS[command]
+    grid_file = read_beamline_file(args.grid) if args.grid else {}
+    unknown = set(grid_file) - {name for name, *_ in parameters}
+    if unknown:
+        raise Exception("Unknown parameters in " + args.grid + ": " + ", ".join(sorted(unknown)))
+    grid = {}
+    for name, kind, default, _ in parameters:
+        values = getattr(args, name)
+        if values is None:
+            values = grid_file.get(name, default)
+        grid[name] = parse_values(values if isinstance(values, list) else [values], kind)
+    return grid
+
+
+# Parameters naming beamline files. The parsed file is added to the job
+# parameters as <name>_config, so jobs and stored results are keyed on the
+# content of the file and edited files are run again.
+FILE_PARAMETERS = ("beamline",)
+
+
+# One job per point of the grid, as (key, parameters)
+def grid_jobs(command: str, grid: dict):
+    names = list(grid)
+    jobs = []
+    for values in itertools.product(*grid.values()):
+        params = dict(zip(names, values))
+        for name in FILE_PARAMETERS:
+            if name in params:
+                params[name + "_config"] = read_beamline_file(params[name])
+        jobs.append((config_key(_job_config(command, params)), params))
+    return jobs
+
+
+# Configuration identifying a job and its stored results
+def _job_config(command: str, params: dict):
+    return {"command": command, "model": MODEL_VERSION, "params": params}
+
+
+# Grid point of a job for messages, without the contents of files
+def _label(params: dict):
+    return {name: value for name, value in params.items() if not name.endswith("_config")}
+
+
+# Keys of the jobs recorded in a progress file
+def completed_keys(progress: str):
+    keys = set()
+    if os.path.exists(progress):
+        with open(progress) as f:
+            for line in f:
+                try:
+                    keys.add(json.loads(line)["key"])
+                except (ValueError, KeyError):
+                    # Line cut short by an interrupted run
+                    continue
+    return keys
+
+
+# Run one job and store its arrays; returns the scalar results
+def run_job(command: str, key: str, params: dict, out: str, plot: bool):
+    job, _, _ = COMMANDS[command]
+    plot_path = None
+    if plot:
+        plot_path = os.path.join(out, "plots", command + "_" + key[:12])
+        Path(os.path.dirname(plot_path)).mkdir(parents=True, exist_ok=True)
+    result = job(params, plot_path)
+    ResultStore(os.path.join(out, "results")).save(_job_config(command, params), result)
+    return {name: float(value) for name, value in result.items() if np.ndim(value) == 0}
+
+
+def _record(f, command: str, key: str, params: dict, summary: dict):
+    f.write(json.dumps({"key": key, "command": command, "params": params, "summary": summary}) + "\n")
+    f.flush()
+
+
+# Run every job of the grid that is not in the progress file yet. max_workers=1
+# runs the jobs in this process.
+def run_batch(command: str, grid: dict, out: str = OUT, max_workers: int = None, plot: bool = False):
+    progress = os.path.join(out, "progress.jsonl")
+    jobs = grid_jobs(command, grid)
+    done = completed_keys(progress)
+    pending = [(key, params) for key, params in jobs if key not in done]
+    print(f"{command}: {len(jobs)} jobs, {len(jobs) - len(pending)} done, {len(pending)} to run")
+    Path(out).mkdir(parents=True, exist_ok=True)
+
+    failed = 0
+    with open(progress, "a") as f:
+        # Record a finished job; failed jobs are reported and left for the next run
+        def report(i: int, key: str, params: dict, result):
+            nonlocal failed
+            try:
+                summary = result()
+            except Exception as e:
+                failed += 1
+                print(f"FAILED {_label(params)}: {e}")
+                return
+            _record(f, command, key, params, summary)
+            print(f"[{i}/{len(pending)}] {_label(params)} {summary}")
+
+        if max_workers == 1:
+            for i, (key, params) in enumerate(pending, 1):
+                report(i, key, params, lambda: run_job(command, key, params, out, plot))
+            return failed
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run_job, command, key, params, out, plot): (key, params) for key, params in pending}
+            try:
+                for i, future in enumerate(as_completed(futures), 1):
+                    key, params = futures[future]
+                    report(i, key, params, future.result)
+            except KeyboardInterrupt:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch runs of the Gaussian beam analyses.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command, (_, description, parameters) in COMMANDS.items():
+        subparser = subparsers.add_parser(command, help=description, description=description)
+        subparser.add_argument("--grid", default=None, help="parameter grid file (.json, .toml or .yaml)")
+        subparser.add_argument("--out", default=OUT, help="directory for results and progress")
+        subparser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+        subparser.add_argument("--plot", action="store_true", help="save a plot of every job")
+        for name, kind, default, text in parameters:
+            subparser.add_argument("--" + name.replace("_", "-"), dest=name, nargs="+", default=None,
+                                   help=text + " (default: " + " ".join(map(str, default)) + ")")
+    args = parser.parse_args(argv)
+
+    grid = parameter_grid(args.command, args)
+    return 1 if run_batch(args.command, grid, args.out, args.workers, args.plot) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import numpy as np
+
+from methods import EllipticalBeam
+
+
+# Complex beam parameter of a mode with 1/e2 radius w and phase radius of
+# curvature R (np.inf for a flat phase front) in [mm] at its reference plane
+def mode_q(wavelength, w, R=np.inf):
+    return 1 / (1 / np.asarray(R, dtype=float) - 1j * wavelength / np.pi / np.asarray(w, dtype=float)**2)
+
+
+class GaussianMode:
+    def __init__(self, waist: float, position: float, curvature: float = np.inf, efficiency: float = 1.0):
+        # 1/e2 radius of the mode at its reference plane in [mm]
+        self.waist = waist
+        # Reference plane (detector aperture) position in [mm]
+        self.position = position
+        # Phase radius of curvature at the reference plane in [mm], positive for
+        # a beam diverging from a waist in front of the plane, negative for a
+        # beam converging to a waist behind it
+        self.curvature = curvature
+        # Fraction of the detector mode power in the fundamental Gaussian
+        self.efficiency = efficiency
+
+    # Corrugated feed horn with given aperture diameter and slant length in [mm].
+    # Its HE11 mode couples 98% to a Gaussian with w = 0.6435 a. The phase
+    # front is centred on the horn apex behind the aperture, so the matched
+    # beam converges into the horn: with q = (z - z0) + i zR the curvature
+    # is negative.
+    @staticmethod
+    def horn(aperture_diameter, slant_length, position: float):
+        return GaussianMode(0.6435 * np.asarray(aperture_diameter, dtype=float) / 2, position, -np.asarray(slant_length, dtype=float), 0.98)
+
+    def q(self, wavelength):
+        return mode_q(wavelength, self.waist, self.curvature)
+
+
+# Power coupling along one axis of fields exp(-ik (x - offset)^2 / 2q - ik tilt x)
+# and exp(-ik x^2 / 2q_mode)
+def _coupling_1d(q, q_mode, wavelength, offset, tilt):
+    k = 2 * np.pi / wavelength
+    a1 = 1j * k / 2 / q
+    a2 = 1j * k / 2 / q_mode
+    A = a1 + np.conj(a2)
+    B = 2 * a1 * offset - 1j * k * tilt
+    C = -a1 * offset**2
+    overlap = np.abs(np.sqrt(np.pi / A) * np.exp(B**2 / 4 / A + C))**2
+    # Norms from the 1/e2 radii, Re(a) = 1 / w^2
+    norm = np.pi / 2 / np.sqrt(np.real(a1) * np.real(a2))
+    return overlap / norm
+
+
+# Power coupling efficiency between a beam and a detector mode, including the
+# offset of the waist position, lateral offsets (x, y) in [mm], tilts (x, y)
+# in [rad] and astigmatism of an EllipticalBeam. All beam and mode parameters
+# broadcast, e.g. a beam focused by Lens(focal_lengths, ...) against arrays of
+# detector waists.
+def coupling_efficiency(beam, mode: GaussianMode, offset=(0.0, 0.0), tilt=(0.0, 0.0)):
+    offset_x, offset_y = offset
+    tilt_x, tilt_y = tilt
+    q_mode = mode.q(beam.wavelength)
+    if isinstance(beam, EllipticalBeam):
+        q = [mode.position - beam.waist_position[i] + 1j * beam.zR[i] for i in range(2)]
+    else:
+        q = [mode.position - beam.waist_position + 1j * beam.zR] * 2
+    eta = _coupling_1d(q[0], q_mode, beam.wavelength, offset_x, tilt_x) * _coupling_1d(q[1], q_mode, beam.wavelength, offset_y, tilt_y)
+    return mode.efficiency * eta
@@ -0,0 +1,118 @@
+import numpy as np
+
+from methods import GaussianBeam
+from abcd import free_space, thin_lens, q_parameter, element_focal_length
+
+# Inverse design of lens/mirror focal lengths for a target output beam. Element
+# positions are fixed; the target is the waist and waist position of the beam
+# after the last element. Focal lengths follow from the complex beam parameter
+# in closed form and are vectorized over arrays of target specs. Solutions come
+# in two branches, stacked on the first axis; targets that cannot be reached
+# give NaN.
+
+
+# Ray transfer matrix from plane start to plane end through the given elements
+def _matrix(elements: list, start: float, end: float, axis: str):
+    M = np.eye(2)
+    z = start
+    for element in elements:
+        M = thin_lens(element_focal_length(element, axis)) @ free_space(element.position - z) @ M
+        z = element.position
+    return free_space(end - z) @ M
+
+
+def _inverse(M):
+    return np.array([[M[1, 1], -M[0, 1]], [-M[1, 0], M[0, 0]]])
+
+
+def _apply(M, q):
+    return (M[0, 0] * q + M[0, 1]) / (M[1, 0] * q + M[1, 1])
+
+
+# Complex beam parameter of the target beam at plane z
+def _target_q(wavelength: float, target_waist, target_position, z: float):
+    return (z - np.asarray(target_position, dtype=float)) + 1j * np.pi * np.asarray(target_waist, dtype=float)**2 / wavelength
+
+
+# 1/q just before element i, for the source propagated through the elements in front of it
+def _inverse_q_before(source: GaussianBeam, elements: list, i: int, axis: str):
+    start = elements[0].position
+    M = _matrix(elements[:i], start, elements[i].position, axis)
+    return 1 / _apply(M, q_parameter(source, start))
+
+
+# Focal lengths in [mm] of free elements i < j so that the beam after the last
+# element has the target waist and waist position in [mm]. The other elements
+# stay as they are. Returns (f_i, f_j), each of shape (2,) + target shape.
+def two_element_focal_lengths(source: GaussianBeam, elements: list, i: int, j: int, target_waist, target_position, axis: str = "sagittal"):
+    elements = sorted(elements, key=lambda e: e.position)
+    if not i < j:
+        raise Exception("Free elements must be given in order of position.")
+    wavelength = source.wavelength
+    p_i = _inverse_q_before(source, elements, i, axis)
+    v = -np.imag(p_i)
+
+    # Target brought back to the plane just behind element j
+    end = elements[-1].position
+    M_down = _matrix(elements[j + 1:], elements[j].position, end, axis)
+    p_t = 1 / _apply(_inverse(M_down), _target_q(wavelength, target_waist, target_position, end))
+    v_t = -np.imag(p_t)
+
+    # Lenses keep Im(1/q), so the beam size on element j must match the target:
+    # (A + B u)^2 + (B v)^2 = v / v_t with u = Re(1/q) just behind element i
+    A, B = _matrix(elements[i + 1:j], elements[i].position, elements[j].position, axis)[0]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        root = np.sqrt(v / v_t - (B * v)**2)
+        u = np.stack([(-A + root) / B, (-A - root) / B])
+        f_i = 1 / (np.real(p_i) - u)
+
+        M_mid = _matrix(elements[i + 1:j], elements[i].position, elements[j].position, axis)
+        p_j = 1 / _apply(M_mid, 1 / (u - 1j * v))
+        f_j = 1 / (np.real(p_j) - np.real(p_t))
+    return f_i, f_j
+
+
+# Focal length in [mm] of free element i putting the output waist at
+# target_position in [mm]. Returns an array of shape (2,) + target shape.
+def focal_length_for_position(source: GaussianBeam, elements: list, i: int, target_position, axis: str = "sagittal"):
+    elements = sorted(elements, key=lambda e: e.position)
+    p_i = _inverse_q_before(source, elements, i, axis)
+    v = -np.imag(p_i)
+    end = elements[-1].position
+    (A, B), (C, D) = _matrix(elements[i + 1:], elements[i].position, end, axis)
+    d = end - np.asarray(target_position, dtype=float)
+
+    # Re(q_out) = d is a quadratic in x = Re(1/q) just behind element i
+    a = B * D - d * D**2
+    b = A * D + B * C - 2 * d * C * D
+    c = A * C + B * D * v**2 - d * (C**2 + D**2 * v**2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        root = np.sqrt(b**2 - 4 * a * c)
+        x = np.where(a != 0, np.stack([(-b + root) / 2 / a, (-b - root) / 2 / a]), np.stack([-c / b, -c / b]))
+        return 1 / (np.real(p_i) - x)
+
+
+# Focal length in [mm] of free element i giving the target output waist in [mm].
+# Returns an array of shape (2,) + target shape.
+def focal_length_for_waist(source: GaussianBeam, elements: list, i: int, target_waist, axis: str = "sagittal"):
+    elements = sorted(elements, key=lambda e: e.position)
+    p_i = _inverse_q_before(source, elements, i, axis)
+    v = -np.imag(p_i)
+    zR = np.pi * np.asarray(target_waist, dtype=float)**2 / source.wavelength
+    _, (C, D) = _matrix(elements[i + 1:], elements[i].position, elements[-1].position, axis)
+
+    # Im(q_out) = v / ((C + D x)^2 + (D v)^2) = zR
+    with np.errstate(invalid="ignore", divide="ignore"):
+        root = np.sqrt(v / zR - (D * v)**2)
+        x = np.stack([(-C + root) / D, (-C - root) / D])
+        return 1 / (np.real(p_i) - x)
+
+
+# Tangential and sagittal radii R, r in [mm] of a toroidal mirror with the given
+# focal lengths in [mm]; a stigmatic mirror by default
+def mirror_radii(tangential_focal_length, incidence_angle: float, sagittal_focal_length=None):
+    if sagittal_focal_length is None:
+        sagittal_focal_length = tangential_focal_length
+    R = 2 * np.asarray(tangential_focal_length, dtype=float) / np.cos(incidence_angle)
+    r = 2 * np.asarray(sagittal_focal_length, dtype=float) * np.cos(incidence_angle)
+    return R, r
@@ -3,7 +3,10 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 from methods import GaussianBeam, Lens, GaussianDistribution , airy_diameter
-from scipy.optimize import minimize
+from detectors import Detector, aperture_overlap
+from aperture_fit import ApertureFit
+from results import ResultStore, source_version
+import methods, detectors, aperture_fit
 
 # Physical constants
 wavelength = 3.15  # wavelength in mm
@@ -56,35 +59,28 @@ convergence = 2 * np.rad2deg(np.atan(optics_diameter / 2 / focal_lengths)) # Ape
 
 detector_acceptance = GaussianDistribution(15, detector_acceptance_angle / 1.699)  # Detector acceptance in degrees
 
-detector_angular_acceptance = []
-for f in focal_lengths:
-    detector_angular_acceptance.append(detector_acceptance.overlap(15, 2 * np.rad2deg(np.arctan(optics_diameter / 2 / f))))
+detector_angular_acceptance = detector_acceptance.overlap(15, 2 * np.rad2deg(np.arctan(optics_diameter / 2 / focal_lengths)))
 
 
 airy_diameters = airy_diameter(wavelength, focal_lengths, optics_diameter)
 
 
-def loss_function(aperture):
-    detector_overlap = []
-    for d in airy_diameters:
-        if (aperture / d)**2 >= 1:
-            detector_overlap.append(1)
-        else:
-            detector_overlap.append((aperture / d)**2)
-    total_efficiency = [x * y for x, y in zip(detector_angular_acceptance, detector_overlap)]
-    
-    # Include only specified range of experimental points
-    valid_indices = [i for i, f in enumerate(experiment_focal_lengths) if 100 <= f <= 400]
-    filtered_focal_lengths = [experiment_focal_lengths[i] for i in valid_indices]
-    filtered_efficiencies = [experiment_efficiencies[i] for i in valid_indices]
-    
-    loss = np.mean((np.interp(filtered_focal_lengths, focal_lengths, total_efficiency) - filtered_efficiencies)**2)
-    return loss
+detector = Detector(detname, detector_aperture, detector_acceptance_angle, experiment, scaling_factor)
 
 apertures = np.linspace(5, 20, 100)  # Range of apertures to test
-losses = [loss_function(aperture) for aperture in apertures]
 
-best_aperture = apertures[np.argmin(losses)]
+def fit_aperture():
+    aperture_fit = ApertureFit(detector, wavelength, optics_diameter, focal_lengths)
+    best_aperture, best_loss = aperture_fit.fit(apertures)
+    return {"losses": aperture_fit.losses(apertures), "best_aperture": best_aperture, "best_loss": best_loss}
+
+# Fit results are stored in outs/results and reused while the configuration and
+# the model code are unchanged
+fit = ResultStore().get_or_compute({"analysis": "aperture_fit", "model": source_version([methods, detectors, aperture_fit]),
+                                    "detector": detector, "wavelength": wavelength,
+                                    "optics_diameter": optics_diameter, "focal_lengths": focal_lengths, "apertures": apertures}, fit_aperture)
+losses = fit["losses"]
+best_aperture, best_loss = float(fit["best_aperture"]), float(fit["best_loss"])
 print(f"Best detector aperture: {best_aperture:.2f} mm")
 
 plt.figure(figsize=(8, 5))
@@ -92,7 +88,7 @@ plt.plot(apertures, losses, label='Mean Squared Error')
 plt.xlabel('Detector Aperture [mm]')
 plt.ylabel('Loss')
 plt.title('Optimization of Detector Aperture')
-plt.scatter([best_aperture], [min(losses)], color='red', label=f'Best Aperture: {best_aperture:.2f} mm')
+plt.scatter([best_aperture], [best_loss], color='red', label=f'Best Aperture: {best_aperture:.2f} mm')
 plt.legend()
 plt.grid(True)
 plt.tight_layout()
@@ -104,13 +100,7 @@ plt.savefig(name + ".jpg")
 
 detector_aperture = best_aperture
 
-detector_overlap = []
-
-for d in airy_diameters:
-    if (detector_aperture / d)**2 >=1:
-        detector_overlap.append(1)
-    else:
-        detector_overlap.append((detector_aperture / d)**2)
+detector_overlap = aperture_overlap(detector_aperture, airy_diameters)
 
 
 convergence = 2 * np.rad2deg(np.atan(optics_diameter / 2 / focal_lengths)) # Apex angle of a convergence cone in degrees
@@ -118,9 +108,7 @@ convergence = 2 * np.rad2deg(np.atan(optics_diameter / 2 / focal_lengths)) # Ape
 
 detector_acceptance = GaussianDistribution(15, detector_acceptance_angle / 1.699)  # Detector acceptance in degrees
 
-detector_angular_acceptance = []
-for f in focal_lengths:
-    detector_angular_acceptance.append(detector_acceptance.overlap(15, 2 * np.rad2deg(np.arctan(optics_diameter / 2 / f))))
+detector_angular_acceptance = detector_acceptance.overlap(15, 2 * np.rad2deg(np.arctan(optics_diameter / 2 / focal_lengths)))
 
 total_efficiency = [x * y for x, y in zip(detector_angular_acceptance, detector_overlap)]
 
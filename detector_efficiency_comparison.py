@@ -3,7 +3,6 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 from methods import GaussianBeam, Lens, GaussianDistribution , airy_diameter
-from scipy.optimize import minimize
 
 # Physical constants
 wavelength = 3.15  # wavelength in mm
@@ -0,0 +1,61 @@
+import numpy as np
+
+from methods import GaussianDistribution, airy_diameter
+
+
+class Detector:
+    def __init__(self, name: str, aperture: float, acceptance_angle: float, experiment: list = None, scaling_factor: float = 1.0):
+        # Detector name used in labels and output file names
+        self.name = name
+        # Diameter of the detector in [mm]
+        self.aperture = aperture
+        # Acceptance angle of the detector in degrees (half-angle FWHM)
+        self.acceptance_angle = acceptance_angle
+        # Measured points as [focal length in mm, measured power in mW]
+        self.experiment = experiment if experiment is not None else []
+        # Scaling factor translating measured power to efficiency
+        self.scaling_factor = scaling_factor
+
+    def acceptance(self):
+        # add factor 1 / 1.699 for translation from 1/e2 to FWHM
+        return GaussianDistribution(15, self.acceptance_angle / 1.699)
+
+    def experiment_focal_lengths(self):
+        return np.array([point[0] for point in self.experiment], dtype=float)
+
+    def experiment_efficiencies(self, scaling_factor: float = None):
+        if scaling_factor is None:
+            scaling_factor = self.scaling_factor
+        return np.array([point[1] for point in self.experiment], dtype=float) * scaling_factor
+
+
+ALVIDAS = Detector("Alvidas", 10, 8.5, [[118, 3.18], [158, 5.46], [180, 5.89], [300, 5.79]], 0.04)
+SMALL_CONE = Detector("smallCone", 12, 7, [[158, 6.75], [180, 8.49], [300, 13.51], [466, 4.16]], 0.022)
+BIG_CONE = Detector("bigCone", 12, 11.5 / 2, [[158, 5.47], [180, 7.18], [300, 13.41], [466, 4.55]], 0.02)
+BARE_WG = Detector("bareWG", 2, 60 / 2, [[68, 2.13], [118, 4.0], [158, 4.09], [180, 4]], 0.16)
+
+DETECTORS = [ALVIDAS, SMALL_CONE, BIG_CONE, BARE_WG]
+
+
+# Apex angle of a convergence cone in degrees
+def convergence_angle(focal_lengths, optics_diameter):
+    return 2 * np.rad2deg(np.arctan(optics_diameter / 2 / np.asarray(focal_lengths, dtype=float)))
+
+
+# Angular efficiency of the detection for each focal length
+def angular_efficiency(detector: Detector, focal_lengths, optics_diameter):
+    return detector.acceptance().overlap(15, convergence_angle(focal_lengths, optics_diameter))
+
+
+# Overlap of the detector aperture with the Airy disk, clipped at 1.
+# Apertures and Airy diameters are broadcast against each other.
+def aperture_overlap(aperture, airy_diameters):
+    return np.minimum(1, (np.asarray(aperture, dtype=float) / np.asarray(airy_diameters, dtype=float))**2)
+
+
+# Total focusing and detection efficiency for each focal length
+def total_efficiency(detector: Detector, wavelength: float, focal_lengths, optics_diameter, aperture=None):
+    if aperture is None:
+        aperture = detector.aperture
+    airy_diameters = airy_diameter(wavelength, np.asarray(focal_lengths, dtype=float), optics_diameter)
+    return angular_efficiency(detector, focal_lengths, optics_diameter) * aperture_overlap(aperture, airy_diameters)
@@ -0,0 +1,97 @@
+import bisect
+import hashlib
+import itertools
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+import methods
+import detectors
+from detectors import Detector, total_efficiency
+from results import source_version
+
+# Bump when the table layout changes
+TABLE_VERSION = 1
+
+AXES = ("focal_length", "optics_diameter", "acceptance_angle", "aperture")
+
+
+class EfficiencyTable:
+    # Total focusing and detection efficiency (detectors.total_efficiency)
+    # precomputed over focal length x optics diameter x acceptance angle x
+    # aperture for one wavelength. Tables are stored as .npy files under a
+    # version hash of the grid and of the model code in methods.py and
+    # detectors.py, so they are rebuilt automatically when the model changes,
+    # and are read back memory-mapped.
+    def __init__(self, wavelength: float, focal_lengths=None, optics_diameters=None, acceptance_angles=None, apertures=None,
+                 root: str = "outs/tables"):
+        # Wavelength of radiation in [mm]
+        self.wavelength = wavelength
+        # Grid axes: focal lengths, optics diameters, apertures in [mm] and
+        # acceptance angles in degrees (half-angle FWHM)
+        self.axes = [
+            np.asarray(np.linspace(1, 1000, 500) if focal_lengths is None else focal_lengths, dtype=float),
+            np.asarray(np.linspace(25, 300, 12) if optics_diameters is None else optics_diameters, dtype=float),
+            np.asarray(np.linspace(2, 40, 20) if acceptance_angles is None else acceptance_angles, dtype=float),
+            np.asarray(np.linspace(1, 20, 20) if apertures is None else apertures, dtype=float),
+        ]
+        for axis in self.axes:
+            if len(axis) < 2 or np.any(np.diff(axis) <= 0):
+                raise Exception("Table axes need at least two increasing values.")
+        self._axes_lists = [axis.tolist() for axis in self.axes]
+        self.path = os.path.join(root, self.version())
+        self.table = self._load() if os.path.exists(os.path.join(self.path, "efficiency.npy")) else self._build()
+
+    def version(self):
+        digest = hashlib.sha256(str(TABLE_VERSION).encode())
+        digest.update(source_version([methods, detectors]).encode())
+        digest.update(np.float64(self.wavelength).tobytes())
+        for axis in self.axes:
+            digest.update(axis.tobytes())
+        return digest.hexdigest()[:16]
+
+    def _build(self):
+        f, D, angle, a = np.meshgrid(*self.axes, indexing="ij", sparse=True)
+        table = total_efficiency(Detector("table", a, angle), self.wavelength, f, D, a)
+        tmp = self.path + "." + str(os.getpid()) + ".tmp"
+        Path(tmp).mkdir(parents=True, exist_ok=True)
+        for name, axis in zip(AXES, self.axes):
+            np.save(os.path.join(tmp, name + ".npy"), axis)
+        np.save(os.path.join(tmp, "efficiency.npy"), table)
+        if os.path.exists(self.path):
+            shutil.rmtree(tmp)
+        else:
+            os.replace(tmp, self.path)
+        return self._load()
+
+    def _load(self):
+        return np.load(os.path.join(self.path, "efficiency.npy"), mmap_mode="r")
+
+    # Multilinear interpolation of the efficiency; arguments broadcast against
+    # each other and are clipped to the table range
+    def __call__(self, focal_length, optics_diameter, acceptance_angle, aperture):
+        if all(np.ndim(x) == 0 for x in (focal_length, optics_diameter, acceptance_angle, aperture)):
+            return self._interpolate_point(focal_length, optics_diameter, acceptance_angle, aperture)
+        points = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (focal_length, optics_diameter, acceptance_angle, aperture)])
+        index, weight = [], []
+        for axis, x in zip(self.axes, points):
+            i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2)
+            t = np.clip((x - axis[i]) / (axis[i + 1] - axis[i]), 0, 1)
+            index.append(i)
+            weight.append((1 - t, t))
+        result = np.zeros(points[0].shape)
+        for corner in itertools.product((0, 1), repeat=4):
+            w = weight[0][corner[0]] * weight[1][corner[1]] * weight[2][corner[2]] * weight[3][corner[3]]
+            result += w * self.table[index[0] + corner[0], index[1] + corner[1], index[2] + corner[2], index[3] + corner[3]]
+        return result
+
+    # Single query: contract the surrounding 2x2x2x2 block axis by axis
+    def _interpolate_point(self, *point):
+        block = self.table
+        for axis, x in zip(self._axes_lists, point):
+            i = min(max(bisect.bisect_right(axis, x) - 1, 0), len(axis) - 2)
+            t = min(max((x - axis[i]) / (axis[i + 1] - axis[i]), 0.0), 1.0)
+            block = (1 - t) * block[i] + t * block[i + 1]
+        return float(block)
@@ -63,9 +63,7 @@ convergence = 2 * np.rad2deg(np.atan(optics_diameter / 2 / focal_lengths)) # Ape
 
 detector_acceptance = GaussianDistribution(15, detector_acceptance_angle / 1.699)  # Detector acceptance in degrees
 
-detector_angular_acceptance = []
-for f in focal_lengths:
-    detector_angular_acceptance.append(detector_acceptance.overlap(15, 2 * np.rad2deg(np.arctan(optics_diameter / 2 / f))))
+detector_angular_acceptance = detector_acceptance.overlap(15, 2 * np.rad2deg(np.arctan(optics_diameter / 2 / focal_lengths)))
 
 total_efficiency = [x * y for x, y in zip(detector_angular_acceptance, detector_overlap)]
 
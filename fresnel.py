@@ -0,0 +1,129 @@
+import warnings
+
+import numpy as np
+import scipy.fft
+
+from methods import GaussianBeam
+
+
+class AngularSpectrumPropagator:
+    # Scalar field on a square grid propagated with the angular spectrum method.
+    # The field buffer, the squared radius grid, transfer functions and
+    # aperture masks are allocated once and reused for every step.
+    def __init__(self, wavelength: float, extent: float, points: int, workers: int = -1):
+        # Wavelength of radiation in [mm]
+        self.wavelength = wavelength
+        # Full width of the grid in [mm]
+        self.extent = extent
+        # Number of grid points per side
+        self.points = points
+        # Number of threads used by scipy.fft, -1 for all cores
+        self.workers = workers
+        # Grid spacing in [mm]
+        self.dx = extent / points
+
+        self.k = 2 * np.pi / wavelength
+        x = (np.arange(points) - points // 2) * self.dx
+        self.r2 = x[:, None] ** 2 + x[None, :] ** 2
+        fx = scipy.fft.fftfreq(points, self.dx)
+        # Fields follow the exp(-ikz) convention of the complex beam parameter,
+        # evanescent components decay
+        self._kz = np.conj(np.sqrt((self.k ** 2 - (2 * np.pi) ** 2 * (fx[:, None] ** 2 + fx[None, :] ** 2)).astype(complex)))
+        self._transfer = {}
+        self._masks = {}
+        self._phase = np.empty((points, points), dtype=complex)
+        self.field = np.zeros((points, points), dtype=complex)
+        # Position of the field plane in [mm]
+        self.z = 0.0
+
+    # Grid extent in [mm] and number of points resolving the beam on every
+    # element and at plane end, and the phase of every element, at most
+    # max_points per side. A capped grid undersamples the beam or the lens
+    # phase, so a warning is issued.
+    @staticmethod
+    def grid_for(beam: GaussianBeam, elements: list, end: float, max_points: int = 4096, oversampling: float = 2.0):
+        radii = [beam.radius(elements[0].position)]
+        for previous, element in zip(elements, elements[1:]):
+            beam = previous.transform(beam)
+            radii.append(beam.radius(element.position))
+        radii.append(elements[-1].transform(beam).radius(end))
+        extent = 2 * max(max(e.diameter for e in elements), 4 * max(radii))
+        dx = min(radii) / 8
+        for e in elements:
+            dx = min(dx, beam.wavelength * abs(e.focal_length) / e.diameter)
+        points = scipy.fft.next_fast_len(int(np.ceil(oversampling * extent / dx / 2)) * 2)
+        if points > max_points:
+            warnings.warn(f"Grid needs {points} points per side, capped at {max_points}: spacing {extent / max_points:.4g} mm instead of {extent / points:.4g} mm", RuntimeWarning)
+            points = max_points
+        return extent, points
+
+    @staticmethod
+    def for_beamline(beam: GaussianBeam, elements: list, end: float, max_points: int = 4096, workers: int = -1):
+        extent, points = AngularSpectrumPropagator.grid_for(beam, sorted(elements, key=lambda e: e.position), end, max_points)
+        return AngularSpectrumPropagator(beam.wavelength, extent, points, workers)
+
+    # Paraxial Gaussian field of a beam at plane z in [mm], normalized to unit power
+    def gaussian_field(self, beam: GaussianBeam, z: float):
+        q = (z - beam.waist_position) + 1j * beam.zR
+        field = np.exp(-1j * self.k * self.r2 / (2 * q))
+        return field / np.sqrt(np.sum(np.abs(field) ** 2) * self.dx ** 2)
+
+    def set_beam(self, beam: GaussianBeam, z: float):
+        self.field[...] = self.gaussian_field(beam, z)
+        self.z = z
+
+    def apply_lens(self, focal_length: float):
+        np.multiply(self.r2, 1j * self.k / (2 * focal_length), out=self._phase)
+        np.exp(self._phase, out=self._phase)
+        np.multiply(self.field, self._phase, out=self.field)
+
+    # Grid points inside an aperture with given diameter in [mm]
+    def _mask(self, diameter: float):
+        if diameter not in self._masks:
+            if len(self._masks) >= 16:
+                self._masks.clear()
+            self._masks[diameter] = self.r2 <= (diameter / 2) ** 2
+        return self._masks[diameter]
+
+    def apply_aperture(self, diameter: float):
+        np.multiply(self.field, self._mask(diameter), out=self.field)
+
+    def propagate(self, distance: float):
+        if distance == 0:
+            return
+        if distance not in self._transfer:
+            if len(self._transfer) >= 16:
+                self._transfer.clear()
+            self._transfer[distance] = np.exp(-1j * self._kz * distance)
+        spectrum = scipy.fft.fft2(self.field, overwrite_x=True, workers=self.workers)
+        np.multiply(spectrum, self._transfer[distance], out=spectrum)
+        field = scipy.fft.ifft2(spectrum, overwrite_x=True, workers=self.workers)
+        # With overwrite_x contiguous complex fields are transformed in place;
+        # otherwise the result is copied back into the buffer
+        if not np.shares_memory(field, self.field):
+            self.field[...] = field
+        self.z += distance
+
+    def power(self):
+        return np.sum(np.abs(self.field) ** 2) * self.dx ** 2
+
+    def power_in_aperture(self, diameter: float):
+        return np.sum(np.abs(self.field[self._mask(diameter)]) ** 2) * self.dx ** 2
+
+    # Power coupling of the field to a mode given on the same grid
+    def overlap(self, mode):
+        return np.abs(np.vdot(mode, self.field)) ** 2 / np.vdot(mode, mode).real / np.vdot(self.field, self.field).real
+
+    # Propagate a beam through elements (clipped by their apertures) up to plane
+    # end in [mm]. Returns the power remaining after every element.
+    def run(self, beam: GaussianBeam, elements: list, end: float):
+        elements = sorted(elements, key=lambda e: e.position)
+        self.set_beam(beam, elements[0].position)
+        transmission = []
+        for element in elements:
+            self.propagate(element.position - self.z)
+            self.apply_aperture(element.diameter)
+            self.apply_lens(element.focal_length)
+            transmission.append(self.power())
+        self.propagate(end - self.z)
+        return np.array(transmission)
@@ -0,0 +1,53 @@
+import numpy as np
+
+from methods import GaussianBeam
+from abcd import BeamTrain
+
+
+# Loss in [dB] for a transmitted power fraction T
+def loss_db(T):
+    return -10 * np.log10(T)
+
+
+class LinkBudget:
+    # Clipping losses of a source beam on the apertures of a chain of elements.
+    # The beam is propagated once; losses can then be evaluated for any number
+    # of candidate element diameters.
+    def __init__(self, source: GaussianBeam, elements: list):
+        # Lenses and mirrors ordered by their position in space
+        self.elements = sorted(elements, key=lambda e: e.position)
+        beams = BeamTrain(self.elements).segments(source)
+        # 1/e2 beam radius on every element in [mm], of shape (elements,) or
+        # (beams, elements) for a GaussianBeamArray source
+        self.radii = np.stack([np.reshape(beam.radius(e.position), np.shape(beam.waist)) for beam, e in zip(beams, self.elements)], axis=-1)
+
+    def diameters(self):
+        return np.array([e.diameter for e in self.elements], dtype=float)
+
+    # Power transmitted through every element aperture. diameters in [mm] has the
+    # number of elements as its last axis, e.g. (candidates, elements), or
+    # (candidates, 1, elements) for a GaussianBeamArray source; by default the
+    # element diameters are used.
+    def transmission(self, diameters=None):
+        if diameters is None:
+            diameters = self.diameters()
+        diameters = np.asarray(diameters, dtype=self.radii.dtype)
+        return -np.expm1(-2 * (diameters / 2) ** 2 / self.radii ** 2)
+
+    def element_loss_db(self, diameters=None):
+        return loss_db(self.transmission(diameters))
+
+    # Loss accumulated up to and including every element in [dB]
+    def cumulative_loss_db(self, diameters=None):
+        return np.cumsum(self.element_loss_db(diameters), axis=-1)
+
+
+# Per element and cumulative clipping losses in [dB] of a train of elements
+def link_budget(source: GaussianBeam, elements: list, diameters=None):
+    budget = LinkBudget(source, elements)
+    element_loss = budget.element_loss_db(diameters)
+    return {
+        "radius": budget.radii,
+        "element_loss_db": element_loss,
+        "cumulative_loss_db": np.cumsum(element_loss, axis=-1),
+    }
@@ -18,10 +18,8 @@ beam2 = lens1.transform(beam1)
 scan_range = 10 ** 5  # mm
 
 x = np.arange(l1pos, scan_range, 100)
-y = [0] * len(x)
-for i in range(len(x)):
-    #y[i] = beam2.power_through_aperture(lens1.diameter / 2, x[i])
-    y[i] = beam2.power_through_aperture(diameter / 2, x[i])
+#y = beam2.power_through_aperture(lens1.diameter / 2, x)
+y = beam2.power_through_aperture(diameter / 2, x)
 
 x = x / 1000  # convert to meters
 
@@ -1,31 +1,208 @@
+from contextlib import contextmanager
+
 import numpy as np
-import matplotlib.pyplot as plt
-import os
-from pathlib import Path
+
+# The numeric core imports only NumPy. Plotting lives in plotting.py and is
+# loaded on first access to methods.Plotter; scipy is imported where it is used.
+
+# Floating point type of new beams. Beams keep the type they were created with,
+# cast positions and apertures to it, and pass it on through lenses and
+# mirrors. float32 halves memory and bandwidth of large sweeps; with unit
+# roundoff u (2**-24 for float32) the relative errors are about
+#   radius:        |dw / w| <= 5u + u (|z| + |z0|) / (2 zR)
+#   transmission:  |dT / T| <= 3u + 2 |dw / w|
+# for a beam with waist position z0 and Rayleigh length zR evaluated at z (see
+# radius_error_bound). check_precision compares results with float64.
+DTYPES = (np.float32, np.float64)
+_dtype = np.float64
+
+
+def set_dtype(dtype):
+    global _dtype
+    if np.dtype(dtype) not in [np.dtype(d) for d in DTYPES]:
+        raise Exception("Unsupported beam dtype " + str(dtype) + ", use float32 or float64.")
+    _dtype = np.dtype(dtype).type
+
+
+def get_dtype():
+    return _dtype
+
+
+# Temporarily create beams with the given dtype:
+#   with precision(np.float32):
+#       beam = GaussianBeam(3.15, 5.6, 0)
+@contextmanager
+def precision(dtype):
+    previous = _dtype
+    set_dtype(dtype)
+    try:
+        yield
+    finally:
+        set_dtype(previous)
+
+
+# Value or array cast to dtype; scalars stay scalars
+def _cast(x, dtype):
+    x = np.asarray(x, dtype=dtype)
+    return x[()] if x.ndim == 0 else x
+
 
 class GaussianBeam:
-    def __init__(self, wavelength: float, waist: float, waist_position: float):        
+    def __init__(self, wavelength: float, waist: float, waist_position: float, dtype=None):        
+        # Floating point type of the beam parameters and results
+        self.dtype = np.dtype(dtype or _dtype).type
         # Wavelength of radiation in [mm]
-        self.wavelength = wavelength
+        self.wavelength = _cast(wavelength, self.dtype)
         # Beam waist (1/e2 radius) in [mm]
-        self.waist = waist
+        self.waist = _cast(waist, self.dtype)
         # Beam waist position in space (one dimensional) in [mm]
-        self.waist_position = waist_position
+        self.waist_position = _cast(waist_position, self.dtype)
         # Rayleigh length in [mm]
         self.zR = np.pi * self.waist**2 / self.wavelength
 
 
     def radius(self, distance: float):
+        distance = _cast(distance, self.dtype)
         return self.waist * np.sqrt(1 + ((distance - self.waist_position) / self.zR)**2)
     
     def divergence(self):
         return self.wavelength / np.pi / self.waist
     
     def power_through_aperture(self, r: float, z: float):
-        T = 1 - np.exp(-2 * r ** 2 / self.radius(z) ** 2)
+        r = _cast(r, self.dtype)
+        T = -np.expm1(-2 * r ** 2 / self.radius(z) ** 2)
+        return T
+
+    # Scan positions from start to end (exclusive) with given step in [mm] in
+    # chunks of at most chunk_size points. Yields (z, radius, transmission)
+    # with the transmission through every aperture radius in [mm] of shape
+    # (apertures, chunk). Memory use does not depend on the scan length.
+    def scan(self, start: float, end: float, step: float, apertures, chunk_size: int = 10**6):
+        r = np.atleast_1d(np.asarray(apertures, dtype=self.dtype))[:, None]
+        points = max(0, int(np.ceil((end - start) / step)))
+        for i in range(0, points, chunk_size):
+            z = (start + step * np.arange(i, min(i + chunk_size, points))).astype(self.dtype)
+            w = self.radius(z)
+            yield z, w, -np.expm1(-2 * r ** 2 / w ** 2)
+
+
+# Wavelength in [mm] of radiation with frequency in [GHz]
+def wavelength_from_frequency(frequency):
+    return 299.792458 / np.asarray(frequency, dtype=float)
+
+
+class GaussianBeamArray:
+    # Batch of N Gaussian beams stored as arrays (struct of arrays).
+    # Methods taking positions evaluate every beam at every position and
+    # return arrays of shape (N, M) for M positions.
+    def __init__(self, wavelength, waist, waist_position, dtype=None):
+        # Floating point type of the beam parameters and results
+        self.dtype = np.dtype(dtype or _dtype).type
+        wavelength, waist, waist_position = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(wavelength, dtype=self.dtype)),
+            np.atleast_1d(np.asarray(waist, dtype=self.dtype)),
+            np.atleast_1d(np.asarray(waist_position, dtype=self.dtype)))
+        if wavelength.ndim != 1:
+            raise Exception("Beam parameters of a GaussianBeamArray must be one dimensional.")
+        # Wavelengths of radiation in [mm]
+        self.wavelength = wavelength.copy()
+        # Beam waists (1/e2 radius) in [mm]
+        self.waist = waist.copy()
+        # Beam waist positions in space (one dimensional) in [mm]
+        self.waist_position = waist_position.copy()
+        # Rayleigh lengths in [mm]
+        self.zR = np.pi * self.waist**2 / self.wavelength
+
+    # One beam per frequency in [GHz] with common waist and waist position in [mm]
+    @staticmethod
+    def from_frequencies(frequency, waist: float, waist_position: float, dtype=None):
+        return GaussianBeamArray(wavelength_from_frequency(frequency), waist, waist_position, dtype)
+
+    @staticmethod
+    def from_beams(beams):
+        return GaussianBeamArray([b.wavelength for b in beams],
+                                 [b.waist for b in beams],
+                                 [b.waist_position for b in beams],
+                                 np.result_type(*[b.dtype for b in beams]))
+
+    def __len__(self):
+        return len(self.waist)
+
+    def __getitem__(self, i):
+        if isinstance(i, (int, np.integer)):
+            return GaussianBeam(self.wavelength[i], self.waist[i], self.waist_position[i], self.dtype)
+        return GaussianBeamArray(self.wavelength[i], self.waist[i], self.waist_position[i], self.dtype)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def radius(self, distance):
+        z = np.atleast_1d(np.asarray(distance, dtype=self.dtype))
+        return self.waist[:, None] * np.sqrt(1 + ((z[None, :] - self.waist_position[:, None]) / self.zR[:, None])**2)
+
+    def divergence(self):
+        return self.wavelength / np.pi / self.waist
+
+    def power_through_aperture(self, r, z):
+        # r may be a scalar or one aperture radius per beam
+        r = np.asarray(r, dtype=self.dtype)
+        if r.ndim == 1:
+            r = r[:, None]
+        T = -np.expm1(-2 * r ** 2 / self.radius(z) ** 2)
         return T
 
 
+class EllipticalBeam:
+    # Astigmatic Gaussian beam with independent x (tangential) and y (sagittal) axes.
+    # Both axes are stored in arrays of length 2 and evaluated together.
+    def __init__(self, wavelength: float, waist_x: float, waist_y: float, waist_position_x: float, waist_position_y: float, dtype=None):
+        # Floating point type of the beam parameters and results
+        self.dtype = np.dtype(dtype or _dtype).type
+        # Wavelength of radiation in [mm]
+        self.wavelength = _cast(wavelength, self.dtype)
+        # Beam waists (1/e2 radius) along x and y in [mm]
+        self.waist = np.array([waist_x, waist_y], dtype=self.dtype)
+        # Beam waist positions along x and y in space (one dimensional) in [mm]
+        self.waist_position = np.array([waist_position_x, waist_position_y], dtype=self.dtype)
+        # Rayleigh lengths along x and y in [mm]
+        self.zR = np.pi * self.waist**2 / self.wavelength
+
+    @staticmethod
+    def from_beam(beam: GaussianBeam):
+        return EllipticalBeam(beam.wavelength, beam.waist, beam.waist, beam.waist_position, beam.waist_position, beam.dtype)
+
+    def x(self):
+        return GaussianBeam(self.wavelength, self.waist[0], self.waist_position[0], self.dtype)
+
+    def y(self):
+        return GaussianBeam(self.wavelength, self.waist[1], self.waist_position[1], self.dtype)
+
+    # Beam radii along x and y, array of shape (2,) + shape of distance
+    def radius(self, distance):
+        distance = np.asarray(distance, dtype=self.dtype)
+        shape = (2,) + (1,) * distance.ndim
+        return self.waist.reshape(shape) * np.sqrt(1 + ((distance - self.waist_position.reshape(shape)) / self.zR.reshape(shape))**2)
+
+    def divergence(self):
+        return self.wavelength / np.pi / self.waist
+
+    # Ratio of the smaller to the larger beam radius
+    def ellipticity(self, distance):
+        w = self.radius(distance)
+        return np.min(w, axis=0) / np.max(w, axis=0)
+
+
+# Waist and waist position in [mm] of a beam behind a thin lens with given
+# focal length, in the dtype of the input beam
+def _thin_lens_transform(focal_length, position: float, input):
+    focal_length = _cast(focal_length, input.dtype)
+    d1 = _cast(position, input.dtype) - input.waist_position
+    w2 = np.abs(focal_length) * input.waist / np.sqrt((d1 - focal_length)**2 + input.zR ** 2)
+    d2 = focal_length + focal_length ** 2 * (d1 - focal_length) / ((d1 - focal_length) ** 2 + input.zR ** 2)
+    return w2, position + d2
+
+
 class Lens:
     def __init__(self, focal_length: float, diameter: float, position: float):        
         # Focal lenght in [mm]
@@ -37,13 +214,15 @@ class Lens:
     
 
     def transform(self, input: GaussianBeam):
-        d1 = self.position - input.waist_position
-        if d1 <= 0:
+        if np.any(self.position - input.waist_position <= 0):
             raise Exception("Lens positioned before waist of the input beam.")
-        w2 = np.abs(self.focal_length) * input.waist / np.sqrt((d1 -self.focal_length)**2 + input.zR ** 2)
-        d2 = self.focal_length + self.focal_length ** 2 * (d1 - self.focal_length) / ((d1 - self.focal_length) ** 2 + input.zR ** 2)
+        w2, z2 = _thin_lens_transform(self.focal_length, self.position, input)
+        if isinstance(input, EllipticalBeam):
+            return EllipticalBeam(input.wavelength, w2[0], w2[1], z2[0], z2[1], input.dtype)
+        if isinstance(input, GaussianBeamArray):
+            return GaussianBeamArray(input.wavelength, w2, z2, input.dtype)
 
-        return GaussianBeam(input.wavelength, w2, self.position + d2)
+        return GaussianBeam(input.wavelength, w2, z2, input.dtype)
     
 
 class ToroidalMirror:
@@ -56,8 +235,14 @@ class ToroidalMirror:
         self.diameter = diameter
         # Lens position in space (one dimensional) in [mm]
         self.position = position
-        # Focal lenghth in [mm]
-        self.focal_length = self.r / 2 / np.cos(incidence_angle)
+        # Angle of incidence in [rad]
+        self.incidence_angle = incidence_angle
+        # Focal lenghth in the plane of incidence (x axis) in [mm]
+        self.tangential_focal_length = self.R * np.cos(incidence_angle) / 2
+        # Focal lenghth perpendicular to the plane of incidence (y axis) in [mm]
+        self.sagittal_focal_length = self.r / 2 / np.cos(incidence_angle)
+        # Focal lenghth used for circular beams in [mm]
+        self.focal_length = self.sagittal_focal_length
 
     @staticmethod
     def from_focal_lengths(front_focal_length: float, back_focal_length: float, incidence_angle: float, diameter: float, position: float):
@@ -68,56 +253,56 @@ class ToroidalMirror:
     
 
     def transform(self, input: GaussianBeam):
-        d1 = self.position - input.waist_position
-        if d1 <= 0:
+        if np.any(self.position - input.waist_position <= 0):
             raise Exception("Mirror positioned before waist of the input beam.")
-        w2 = self.focal_length * input.waist / np.sqrt((d1 -self.focal_length)**2 + input.zR ** 2)
-        d2 = self.focal_length + self.focal_length ** 2 * (d1 - self.focal_length) / ((d1 - self.focal_length) ** 2 + input.zR ** 2)
-
-        return GaussianBeam(input.wavelength, w2, self.position + d2)
+        if isinstance(input, EllipticalBeam):
+            # Tangential and sagittal axes are transformed together
+            focal_lengths = np.array([self.tangential_focal_length, self.sagittal_focal_length])
+            w2, z2 = _thin_lens_transform(focal_lengths, self.position, input)
+            return EllipticalBeam(input.wavelength, w2[0], w2[1], z2[0], z2[1], input.dtype)
+        w2, z2 = _thin_lens_transform(self.focal_length, self.position, input)
+        if isinstance(input, GaussianBeamArray):
+            return GaussianBeamArray(input.wavelength, w2, z2, input.dtype)
+
+        return GaussianBeam(input.wavelength, w2, z2, input.dtype)
    
 
 
-class Plotter:
-    def __init__(self, point_density: float = 1.0):        
-        # Density of points in the plot
-        self.point_density = point_density
-        plt.xlabel('Distance [mm]')
-        plt.ylabel('1/e2 beam radius [mm]')
-
-
-    def add_beam(self, beam: GaussianBeam, start: float, end: float):
-        x = np.arange(start, end, self.point_density)
-        y = [0] * len(x)
-        for i in range(len(x)):
-            y[i] = beam.radius(x[i])
+# Relative error bounds of GaussianBeam.radius and power_through_aperture of
+# a beam evaluated in dtype at positions z in [mm]. Errors of the beam
+# parameters themselves, e.g. from lens transforms, come on top; check_precision
+# measures the complete error.
+def radius_error_bound(beam, z, dtype=np.float32):
+    u = np.finfo(dtype).eps / 2
+    z = np.asarray(z, dtype=float)
+    return 5 * u + u * (np.abs(z) + np.abs(beam.waist_position)) / (2 * beam.zR)
+
+
+def transmission_error_bound(beam, z, dtype=np.float32):
+    return 3 * np.finfo(dtype).eps / 2 + 2 * radius_error_bound(beam, z, dtype)
+
+
+# Validation of reduced precision runs. compute(sample) creates its beams and
+# returns a result array; it runs once with beams in dtype and once in float64
+# on at most size points drawn from sample. Returns the largest relative
+# difference and raises an Exception if it exceeds rtol. rtol is a scalar or
+# a function of the drawn points returning the tolerance for every point, e.g.
+#   check_precision(f, z, lambda z: transmission_error_bound(beam, z))
+def check_precision(compute, sample, rtol, dtype=np.float32, size: int = 10**5, seed: int = 0):
+    sample = np.asarray(sample, dtype=float)
+    if sample.size > size:
+        sample = np.sort(np.random.default_rng(seed).choice(sample.ravel(), size, replace=False))
+    if callable(rtol):
+        rtol = rtol(sample)
+    with precision(dtype):
+        low = np.asarray(compute(sample), dtype=float)
+    with precision(np.float64):
+        high = np.asarray(compute(sample), dtype=float)
+    error = np.abs(low - high) / np.abs(high)
+    if np.any(error > rtol):
+        raise Exception(np.dtype(dtype).name + " results differ from float64 by up to " + f"{np.max(error):.3g}" + " (relative).")
+    return np.max(error)
 
-        plt.plot(x,y)
-
-    def add_lens(self, lens: Lens):
-        x = [lens.position, lens.position]
-        y = [0, lens.diameter / 2]
-
-        plt.plot(x, y)
-
-    def add_mirror(self, mirror: ToroidalMirror):
-        x = [mirror.position, mirror.position]
-        y = [0, mirror.diameter / 2]
-
-        plt.plot(x, y)
-
-    def add_transmission(self, beam: GaussianBeam, lens: Lens):
-        T = beam.power_through_aperture(lens.diameter / 2, lens.position)
-        plt.text(lens.position, lens.diameter / 2, "T = " + str(int(100*T)) + "%")
-
-    def save(self, path):
-        self._prepare_path_to_save(path)
-        plt.savefig(path)
-
-    def _prepare_path_to_save(self, path):
-        dirs = os.path.dirname(path)
-        Path(dirs).mkdir(parents=True, exist_ok=True)
-    
 
 # Airy disk diameter (first minimum)
 def airy_diameter(wavelength, focal_length, aperture_diameter):
@@ -135,7 +320,21 @@ class GaussianDistribution:
         
 
         def overlap(self, PW_beam_angle, PW_beam_diameter):
-            # The product of a Gaussian beam with rectangular plane wave
+            # The product of a Gaussian beam with rectangular plane wave,
+            # normalised to the peak of the distribution and the plane wave width.
+            # Closed form, accepts arrays of angles and diameters.
+            from scipy.special import erf
+
+            PW_beam_angle = np.asarray(PW_beam_angle, dtype=float)
+            PW_beam_diameter = np.asarray(PW_beam_diameter, dtype=float)
+            lower = (PW_beam_angle - PW_beam_diameter / 2 - self.mean) / (self.stddev * np.sqrt(2))
+            upper = (PW_beam_angle + PW_beam_diameter / 2 - self.mean) / (self.stddev * np.sqrt(2))
+            area_product = self.stddev * np.sqrt(np.pi / 2) * (erf(upper) - erf(lower)) / PW_beam_diameter
+
+            return area_product
+
+        def overlap_numeric(self, PW_beam_angle, PW_beam_diameter):
+            # Numerical reference for overlap, integrated with a fixed 0.01 step
             
             
 
@@ -147,4 +346,15 @@ class GaussianDistribution:
             area_product = np.sum(y) * (x[1] - x[0]) / self.value(self.mean) / PW_beam_diameter  # Approximate integral using the trapezoidal rule
 
 
-            return area_product
\ No newline at end of file
+            return area_product
+
+
+_PLOTTING = ("Plotter", "render_plots", "ADAPTIVE_POINTS")
+
+
+# Plotting names are loaded from plotting.py on first use
+def __getattr__(name):
+    if name in _PLOTTING:
+        import plotting
+        return getattr(plotting, name)
+    raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
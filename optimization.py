@@ -0,0 +1,101 @@
+import numpy as np
+
+from methods import GaussianBeam, Lens, ToroidalMirror
+from abcd import propagate_with_gradient, waist_with_gradient, radius_squared_with_gradient, transmission_with_gradient
+
+
+# Copy of a lens or mirror with some of its parameters replaced
+def with_parameters(element, **changes):
+    if isinstance(element, ToroidalMirror):
+        params = dict(R=element.R, r=element.r, incidence_angle=element.incidence_angle,
+                      diameter=element.diameter, position=element.position)
+        params.update(changes)
+        return ToroidalMirror(**params)
+    params = dict(focal_length=element.focal_length, diameter=element.diameter, position=element.position)
+    params.update(changes)
+    return Lens(**params)
+
+
+class BeamlineOptimizer:
+    # Gradient based optimization of free parameters of a chain of lenses and
+    # mirrors. Gradients are analytic, propagated through the complex beam
+    # parameter together with the beam (see abcd.propagate_with_gradient).
+    def __init__(self, source: GaussianBeam, elements: list, parameters: list, bounds: list = None, axis: str = "sagittal"):
+        # Beam incident on the first element
+        self.source = source
+        # Lenses and mirrors ordered by their position in space
+        self.elements = sorted(elements, key=lambda e: e.position)
+        # Free parameters as (element index, parameter name) pairs, names as in
+        # the element constructors: focal_length, R, r, incidence_angle, position
+        self.parameters = list(parameters)
+        # (min, max) for every free parameter, None for no bound
+        self.bounds = bounds
+        # Axis used for mirror focal lengths, "sagittal" as ToroidalMirror.transform
+        self.axis = axis
+        # Parameters are optimized relative to their initial values
+        self._scale = np.where(self.values() != 0, np.abs(self.values()), 1.0)
+
+    def values(self):
+        return np.array([getattr(self.elements[i], name) for i, name in self.parameters], dtype=float)
+
+    # Elements with the free parameters set to values x, ordered by position
+    def elements_for(self, x):
+        return self._ordered(x)[0]
+
+    # Elements with the free parameters set to values x, reordered by position
+    # when free positions pass each other, and the free parameters with element
+    # indices into the new order
+    def _ordered(self, x):
+        changes = {}
+        for (i, name), value in zip(self.parameters, x):
+            changes.setdefault(i, {})[name] = float(value)
+        elements = [with_parameters(e, **changes[i]) if i in changes else e for i, e in enumerate(self.elements)]
+        order = sorted(range(len(elements)), key=lambda i: elements[i].position)
+        rank = {i: k for k, i in enumerate(order)}
+        return [elements[i] for i in order], [(rank[i], name) for i, name in self.parameters]
+
+    # Negative log of the power transmitted through all element apertures
+    def transmission_loss(self, x):
+        elements, parameters = self._ordered(x)
+        q_in, dq_in, _, _ = propagate_with_gradient(self.source, elements, parameters, self.axis)
+        w2, dw2 = radius_squared_with_gradient(q_in, dq_in, self.source.wavelength)
+        T, dT = transmission_with_gradient([e.diameter / 2 for e in elements], w2, dw2)
+        return -np.sum(np.log(T)), -np.sum(dT / T[:, None], axis=0)
+
+    # Squared relative error of the output waist and of its position,
+    # the latter relative to the target Rayleigh length
+    def waist_error(self, x, target_waist: float, target_position: float):
+        end = self.elements[-1].position
+        elements, parameters = self._ordered(x)
+        _, _, q, dq = propagate_with_gradient(self.source, elements, parameters, self.axis, end)
+        waist, dwaist, position, dposition = waist_with_gradient(q, dq, self.source.wavelength, end)
+        zR = np.pi * target_waist**2 / self.source.wavelength
+        error = ((waist - target_waist) / target_waist)**2 + ((position - target_position) / zR)**2
+        gradient = 2 * (waist - target_waist) / target_waist**2 * dwaist + 2 * (position - target_position) / zR**2 * dposition
+        return error, gradient
+
+    def maximize_transmission(self, x0=None):
+        return self._minimize(self.transmission_loss, x0)
+
+    def match_waist(self, target_waist: float, target_position: float, x0=None):
+        return self._minimize(lambda x: self.waist_error(x, target_waist, target_position), x0)
+
+    # Minimize objective(x) -> (value, gradient) with L-BFGS-B. The returned
+    # scipy OptimizeResult carries the optimized elements in result.elements.
+    def _minimize(self, objective, x0=None):
+        if x0 is None:
+            x0 = self.values()
+
+        def scaled(u):
+            value, gradient = objective(u * self._scale)
+            return value, gradient * self._scale
+
+        bounds = None
+        if self.bounds is not None:
+            bounds = [(None if b is None or b[0] is None else b[0] / s, None if b is None or b[1] is None else b[1] / s)
+                      for b, s in zip(self.bounds, self._scale)]
+        from scipy.optimize import minimize
+        result = minimize(scaled, np.asarray(x0, dtype=float) / self._scale, jac=True, method="L-BFGS-B", bounds=bounds)
+        result.x = result.x * self._scale
+        result.elements = self.elements_for(result.x)
+        return result
@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from methods import GaussianBeam, Lens, ToroidalMirror
+
+
+class Plotter:
+    def __init__(self, point_density: float = 1.0, adaptive: bool = False, figsize: tuple = None):        
+        # Density of points in the plot
+        self.point_density = point_density
+        # Sample beams uniformly in Gouy phase instead of distance, which puts
+        # more points near waists and few in the linear far field
+        self.adaptive = adaptive
+        # Every plotter owns its figure, rendered with the non-interactive Agg backend
+        self.figure = Figure(figsize=figsize)
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.axes.set_xlabel('Distance [mm]')
+        self.axes.set_ylabel('1/e2 beam radius [mm]')
+
+
+    def add_beam(self, beam: GaussianBeam, start: float, end: float):
+        x = self._sample(beam, start, end)
+        y = beam.radius(x)
+
+        self.axes.plot(x, y.T)
+
+    def add_lens(self, lens: Lens):
+        x = [lens.position, lens.position]
+        y = [0, lens.diameter / 2]
+
+        self.axes.plot(x, y)
+
+    def add_mirror(self, mirror: ToroidalMirror):
+        x = [mirror.position, mirror.position]
+        y = [0, mirror.diameter / 2]
+
+        self.axes.plot(x, y)
+
+    def add_transmission(self, beam: GaussianBeam, lens: Lens):
+        T = beam.power_through_aperture(lens.diameter / 2, lens.position)
+        self.axes.text(lens.position, lens.diameter / 2, "T = " + str(int(100*T)) + "%")
+
+    def save(self, path):
+        self._prepare_path_to_save(path)
+        self.figure.savefig(path)
+
+    def _prepare_path_to_save(self, path):
+        dirs = os.path.dirname(path)
+        Path(dirs).mkdir(parents=True, exist_ok=True)
+
+    def _sample(self, beam, start: float, end: float):
+        x = np.arange(start, end, self.point_density)
+        if not self.adaptive or len(x) <= ADAPTIVE_POINTS:
+            return x
+        # Points equally spaced in Gouy phase for every axis of the beam
+        samples = [np.array([start, end])]
+        for z0, zR in zip(np.atleast_1d(beam.waist_position), np.atleast_1d(beam.zR)):
+            psi = np.linspace(np.arctan((start - z0) / zR), np.arctan((end - z0) / zR), ADAPTIVE_POINTS)
+            samples.append(z0 + zR * np.tan(psi))
+        return np.clip(np.unique(np.concatenate(samples)), start, end)
+
+
+# Number of points per beam segment used by adaptive plotting
+ADAPTIVE_POINTS = 500
+
+
+def _render(job):
+    build, args = job
+    build(*args)
+
+
+# Render many figures in parallel worker processes. build is a module level
+# function creating and saving one figure from each tuple of arguments in jobs.
+def render_plots(build, jobs: list, max_workers: int = None):
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(_render, [(build, args) for args in jobs]))
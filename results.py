@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+
+# JSON compatible description of a configuration. Beams, elements, detectors
+# and other objects are described by their type and attributes, arrays by
+# dtype, shape and content hash.
+def describe(obj):
+    if isinstance(obj, dict):
+        return {str(k): describe(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [describe(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        data = np.ascontiguousarray(obj)
+        return {"dtype": data.dtype.str, "shape": list(data.shape), "sha256": hashlib.sha256(data.tobytes()).hexdigest()}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, type):
+        return obj.__name__
+    if hasattr(obj, "__dict__"):
+        return {"type": type(obj).__name__, **{k: describe(v) for k, v in vars(obj).items() if not k.startswith("_")}}
+    return obj
+
+
+# Hash of the source code of the given modules. Adding it to a configuration
+# invalidates stored results when the model code changes.
+def source_version(modules: list):
+    digest = hashlib.sha256()
+    for module in modules:
+        digest.update(Path(module.__file__).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+# Content hash of a configuration
+def config_key(config):
+    text = json.dumps(describe(config), sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultStore:
+    # Computed arrays stored under the hash of the full input configuration.
+    # Every result is a directory with config.json and one .npy file per
+    # array, read back memory-mapped.
+    def __init__(self, root: str = "outs/results"):
+        self.root = root
+
+    def path(self, config):
+        return os.path.join(self.root, config_key(config))
+
+    def __contains__(self, config):
+        return os.path.exists(os.path.join(self.path(config), "config.json"))
+
+    def save(self, config, arrays: dict):
+        path = self.path(config)
+        tmp = path + "." + str(os.getpid()) + ".tmp"
+        Path(tmp).mkdir(parents=True, exist_ok=True)
+        for name, values in arrays.items():
+            np.save(os.path.join(tmp, name + ".npy"), np.asarray(values))
+        with open(os.path.join(tmp, "config.json"), "w") as f:
+            json.dump(describe(config), f, indent=2, sort_keys=True)
+        if os.path.exists(path):
+            shutil.rmtree(tmp)
+        else:
+            os.replace(tmp, path)
+        return path
+
+    def load(self, config, mmap: bool = True):
+        path = self.path(config)
+        if config not in self:
+            raise Exception("No stored result for configuration " + os.path.basename(path))
+        return {p.stem: np.load(p, mmap_mode="r" if mmap else None) for p in sorted(Path(path).glob("*.npy"))}
+
+    # Stored arrays for config, computed with compute() and stored if missing
+    def get_or_compute(self, config, compute):
+        if config not in self:
+            self.save(config, compute())
+        return self.load(config)
@@ -0,0 +1,51 @@
+import os
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from methods import GaussianBeam
+
+
+# Stream a GaussianBeam.scan into a file, one chunk at a time, in the dtype of the beam.
+# .npy files hold a memory-mapped table with columns z, radius and the
+# transmission through every aperture; .parquet files (requires pyarrow) hold
+# the same columns named z, radius, T0, T1, ...
+def write_scan(beam: GaussianBeam, path, start: float, end: float, step: float, apertures, chunk_size: int = 10**6):
+    apertures = np.atleast_1d(np.asarray(apertures, dtype=float))
+    points = max(0, int(np.ceil((end - start) / step)))
+    dirs = os.path.dirname(path)
+    if dirs:
+        Path(dirs).mkdir(parents=True, exist_ok=True)
+    chunks = beam.scan(start, end, step, apertures, chunk_size)
+
+    suffix = Path(path).suffix.lower()
+    if suffix == ".npy":
+        table = open_memmap(path, mode="w+", dtype=beam.dtype, shape=(points, 2 + len(apertures)))
+        i = 0
+        for z, w, T in chunks:
+            table[i:i + len(z), 0] = z
+            table[i:i + len(z), 1] = w
+            table[i:i + len(z), 2:] = T.T
+            i += len(z)
+        table.flush()
+        del table
+    elif suffix == ".parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("pyarrow is required to write Parquet scans.")
+        names = ["z", "radius"] + ["T" + str(i) for i in range(len(apertures))]
+        schema = pa.schema([(name, pa.from_numpy_dtype(beam.dtype)) for name in names])
+        with pq.ParquetWriter(path, schema) as writer:
+            for z, w, T in chunks:
+                writer.write_table(pa.Table.from_arrays([pa.array(z), pa.array(w)] + [pa.array(t) for t in T], schema=schema))
+    else:
+        raise Exception("Unsupported scan file format: " + suffix)
+    return path
+
+
+# Memory-mapped view of a scan written to .npy by write_scan
+def read_scan(path):
+    return np.load(path, mmap_mode="r")
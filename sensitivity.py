@@ -0,0 +1,71 @@
+import numpy as np
+
+from methods import GaussianBeam
+from abcd import propagate_with_gradient, waist_with_gradient, radius_squared_with_gradient, transmission_with_gradient
+
+OUTPUTS = ("waist_x", "waist_position_x", "waist_y", "waist_position_y", "transmission")
+
+# Typical parameter change used to rank sensitivities: 1 mm or 1 mrad
+STEPS = {"focal_length": 1.0, "R": 1.0, "r": 1.0, "position": 1.0, "incidence_angle": 1e-3}
+
+
+# Every free parameter of a chain of lenses and mirrors as (element index, name)
+def element_parameters(elements: list):
+    parameters = []
+    for i, element in enumerate(elements):
+        names = ["R", "r", "incidence_angle"] if hasattr(element, "incidence_angle") else ["focal_length"]
+        parameters += [(i, name) for name in names + ["position"]]
+    return parameters
+
+
+# Output beam (waists and waist positions in [mm] on the tangential x and
+# sagittal y axes, cumulative transmission) and its Jacobian with respect to
+# every element parameter, from one forward mode pass per axis. The output
+# plane is fixed at the last element. Transmission uses the geometric mean of
+# the x and y beam radii on every aperture.
+def jacobian(source: GaussianBeam, elements: list):
+    elements = sorted(elements, key=lambda e: e.position)
+    parameters = element_parameters(elements)
+    end = elements[-1].position
+    values, rows, w2, dw2 = [], [], [], []
+    for axis in ("tangential", "sagittal"):
+        q_in, dq_in, q, dq = propagate_with_gradient(source, elements, parameters, axis, end)
+        waist, dwaist, position, dposition = waist_with_gradient(q, dq, source.wavelength, end)
+        values += [waist, position]
+        rows += [dwaist, dposition]
+        w2_axis, dw2_axis = radius_squared_with_gradient(q_in, dq_in, source.wavelength)
+        w2.append(w2_axis)
+        dw2.append(dw2_axis)
+
+    # Product of the x and y radii on every element and its derivatives
+    area = np.sqrt(w2[0] * w2[1])
+    darea = (dw2[0] * w2[1][:, None] + w2[0][:, None] * dw2[1]) / 2 / area[:, None]
+    T, dT = transmission_with_gradient([e.diameter / 2 for e in elements], area, darea)
+    total = np.prod(T)
+    values.append(total)
+    rows.append(total * np.sum(dT / T[:, None], axis=0))
+    return np.array(values), np.real(np.array(rows)), parameters
+
+
+# Rows of (output, element, parameter, derivative, effect) grouped by output in
+# the order of OUTPUTS and sorted within every output by the size of the
+# effect, the change of the output for a typical parameter change (STEPS).
+# Outputs have different units, so effects are only ranked within an output.
+def sensitivity_table(source: GaussianBeam, elements: list, output: str = None, steps: dict = None):
+    steps = dict(STEPS, **(steps or {}))
+    _, J, parameters = jacobian(source, elements)
+    rows = []
+    for k, name in enumerate(OUTPUTS):
+        if output is not None and name != output:
+            continue
+        for j, (i, parameter) in enumerate(parameters):
+            rows.append({"output": name, "element": i, "parameter": parameter,
+                         "derivative": J[k, j], "effect": J[k, j] * steps[parameter]})
+    return sorted(rows, key=lambda row: (OUTPUTS.index(row["output"]), -abs(row["effect"])))
+
+
+def format_sensitivity_table(rows: list):
+    lines = [f"{'output':18s} {'element':>7s} {'parameter':16s} {'derivative':>14s} {'effect':>14s}"]
+    for row in rows:
+        lines.append(f"{row['output']:18s} {row['element']:7d} {row['parameter']:16s} {row['derivative']:14.6g} {row['effect']:14.6g}")
+    return "\n".join(lines)
@@ -1,6 +1,7 @@
 import numpy as np
 
-from methods import GaussianBeam, Lens, Plotter
+from methods import GaussianBeam, Lens
+from plotting import Plotter
 
 wavelength = 3.15 # mm
 source_waist = 5.6 # mm for photomixing
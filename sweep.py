@@ -0,0 +1,62 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from detectors import Detector, total_efficiency
+from aperture_fit import ApertureFit
+
+# Scalar columns of the sweep table, one value per job
+COLUMNS = ("detector", "optics_diameter", "wavelength", "aperture", "best_focal_length", "max_efficiency")
+
+
+# Efficiency curve and its optimum for one detector, optics diameter and wavelength
+def _sweep_job(detector: Detector, optics_diameter: float, wavelength: float, focal_lengths, fit_aperture: bool):
+    aperture = detector.aperture
+    if fit_aperture:
+        aperture, _ = ApertureFit(detector, wavelength, optics_diameter, focal_lengths).fit()
+    efficiency = total_efficiency(detector, wavelength, focal_lengths, optics_diameter, aperture)
+    index_max = np.argmax(efficiency)
+    return {
+        "detector": detector.name,
+        "optics_diameter": optics_diameter,
+        "wavelength": wavelength,
+        "aperture": aperture,
+        "best_focal_length": focal_lengths[index_max],
+        "max_efficiency": efficiency[index_max],
+        "efficiency": efficiency,
+    }
+
+
+def _run_job(args):
+    return _sweep_job(*args)
+
+
+# Sweep every detector over a grid of optics diameters and wavelengths in [mm].
+# Jobs are spread over a process pool; max_workers=1 runs them in this process.
+# Returns a table as a dict of columns, with the efficiency curves stacked
+# into an array of shape (jobs, focal lengths). An empty grid gives a table
+# with no rows.
+def run_sweep(detectors: list, optics_diameters, wavelengths, focal_lengths=None,
+              fit_aperture: bool = False, max_workers: int = None):
+    if focal_lengths is None:
+        focal_lengths = np.linspace(1, 1000, 1000)
+    focal_lengths = np.asarray(focal_lengths, dtype=float)
+    jobs = [(detector, float(diameter), float(wavelength), focal_lengths, fit_aperture)
+            for detector, diameter, wavelength in itertools.product(detectors, np.atleast_1d(optics_diameters), np.atleast_1d(wavelengths))]
+
+    if not jobs:
+        rows = []
+    elif max_workers == 1:
+        rows = [_run_job(job) for job in jobs]
+    else:
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(jobs) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            rows = list(executor.map(_run_job, jobs, chunksize=chunksize))
+
+    table = {key: np.array([row[key] for row in rows]) for key in COLUMNS}
+    table["efficiency"] = np.array([row["efficiency"] for row in rows]).reshape(len(rows), len(focal_lengths))
+    table["focal_lengths"] = focal_lengths
+    return table
@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+import pytest
+
+from methods import GaussianBeam, Lens
+from abcd import BeamTrain, q_parameter
+from beamline import build_beamline, read_beamline_file
+
+POLFEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "beamlines", "polfel_tm5.toml")
+
+
+def _polfel():
+    line = build_beamline(read_beamline_file(POLFEL))
+    return line.source, line.elements
+
+
+def test_segments_match_chained_transforms():
+    source, elements = _polfel()
+    beams = BeamTrain(elements).segments(source)
+    beam = source
+    for element, segment in zip(elements, beams[1:]):
+        beam = element.transform(beam)
+        np.testing.assert_allclose([segment.waist, segment.waist_position], [beam.waist, beam.waist_position], rtol=1e-9)
+
+
+def test_propagate_matches_last_transform():
+    source, elements = _polfel()
+    beam = source
+    for element in elements:
+        beam = element.transform(beam)
+    output = BeamTrain(elements).propagate(source)
+    np.testing.assert_allclose([output.waist, output.waist_position], [beam.waist, beam.waist_position], rtol=1e-9)
+    # A plane behind the last element only moves the reference plane
+    behind = BeamTrain(elements).propagate(source, end=elements[-1].position + 500)
+    np.testing.assert_allclose([behind.waist, behind.waist_position], [beam.waist, beam.waist_position], rtol=1e-9)
+
+
+# Lens 20 mm in front of the waist of a converging beam, inside its Rayleigh range
+def test_element_before_the_waist():
+    source = GaussianBeam(3.15, 5.6, 100)
+    lens = Lens(200, 50, 80)
+    with pytest.raises(Exception):
+        lens.transform(source)
+    output = BeamTrain([lens]).propagate(source)
+    # Thin lens: 1/q' = 1/q - 1/f
+    q = 1 / (1 / q_parameter(source, 80) - 1 / 200)
+    np.testing.assert_allclose(q_parameter(output, 80), q, rtol=1e-12)
+    assert output.waist < source.waist
@@ -0,0 +1,31 @@
+import os
+
+import numpy as np
+
+import beamline
+from beamline import build_beamline, compile_beamline, config_hash, read_beamline_file
+
+POLFEL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "beamlines", "polfel_tm5.toml")
+
+
+def _config():
+    return read_beamline_file(POLFEL)
+
+
+def test_cache_returns_compiled_beams(tmp_path):
+    config = _config()
+    first = compile_beamline(config, str(tmp_path))
+    cached = compile_beamline(config, str(tmp_path))
+    np.testing.assert_array_equal(cached.beams.waist, first.beams.waist)
+    np.testing.assert_array_equal(cached.beams.waist_position, first.beams.waist_position)
+
+
+def test_cache_key_follows_model_code(monkeypatch):
+    config = _config()
+    key = config_hash(config)
+    monkeypatch.setattr(beamline, "source_version", lambda modules: "changed")
+    assert config_hash(config) != key
+
+
+def test_plot_compiles_first():
+    assert len(build_beamline(_config()).plot().axes.lines) > 0
@@ -0,0 +1,21 @@
+import pytest
+
+from benchmarks import CASES, import_time, regressions
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_case_runs(name):
+    factory, sizes = CASES[name]
+    factory(min(sizes))()
+
+
+def test_benchmarks_import_is_light():
+    # Only the plotting case loads matplotlib
+    time, loaded = import_time("benchmarks", repeat=1)
+    assert "matplotlib" not in loaded
+
+
+def test_regressions_use_threshold():
+    baseline = {"radius[1]": 1.0, "overlap[1]": 1.0}
+    results = {"radius[1]": 1.2, "overlap[1]": 1.3, "new[1]": 5.0}
+    assert regressions(results, baseline, 0.25) == {"overlap[1]": pytest.approx(1.3)}
@@ -0,0 +1,24 @@
+import json
+import os
+
+import pytest
+
+import cli
+
+
+# Every subcommand runs with its default grid in this process and records its job
+@pytest.mark.parametrize("command", list(cli.COMMANDS))
+def test_subcommand_runs(command, tmp_path, monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert cli.main([command, "--workers", "1", "--out", str(tmp_path)]) == 0
+    with open(tmp_path / "progress.jsonl") as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 1 and records[0]["command"] == command
+    assert cli.main([command, "--workers", "1", "--out", str(tmp_path)]) == 0
+
+
+def test_failed_job_is_reported(tmp_path, monkeypatch):
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert cli.main(["focusing", "--detector", "Alvidas", "unknown", "--workers", "1", "--out", str(tmp_path)]) == 1
+    with open(tmp_path / "progress.jsonl") as f:
+        assert len(f.readlines()) == 1
@@ -0,0 +1,34 @@
+import numpy as np
+
+from methods import GaussianBeam
+from coupling import GaussianMode, coupling_efficiency
+
+WAVELENGTH = 3.15
+
+
+# Beam matched to a mode: its q at the mode plane equals the mode q
+def matched_beam(mode):
+    q = mode.q(WAVELENGTH)
+    waist = np.sqrt(WAVELENGTH * np.imag(q) / np.pi)
+    return GaussianBeam(WAVELENGTH, waist, mode.position - np.real(q))
+
+
+def test_horn_matches_beam_converging_into_horn():
+    horn = GaussianMode.horn(12, 40, 1000)
+    beam = matched_beam(horn)
+    # Waist behind the aperture, inside the horn
+    assert beam.waist_position > horn.position
+    np.testing.assert_allclose(coupling_efficiency(beam, horn), 0.98)
+
+    # Same beam mirrored about the aperture, diverging into the horn
+    diverging = GaussianBeam(WAVELENGTH, beam.waist, 2 * horn.position - beam.waist_position)
+    assert coupling_efficiency(diverging, horn) < coupling_efficiency(beam, horn)
+
+
+def test_coupling_drops_with_offset_and_tilt():
+    mode = GaussianMode(5.0, 1000)
+    beam = GaussianBeam(WAVELENGTH, 5.0, 1000)
+    np.testing.assert_allclose(coupling_efficiency(beam, mode), 1.0)
+    # Lateral offset d: exp(-d^2 / w^2) per axis for equal waists
+    np.testing.assert_allclose(coupling_efficiency(beam, mode, offset=(2.0, 0.0)), np.exp(-4 / 25))
+    assert coupling_efficiency(beam, mode, tilt=(0.01, 0.0)) < 1.0
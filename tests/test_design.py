@@ -0,0 +1,69 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from methods import GaussianBeam, Lens, ToroidalMirror
+from abcd import BeamTrain
+from design import two_element_focal_lengths, focal_length_for_position, focal_length_for_waist, mirror_radii
+
+SOURCE = GaussianBeam(3.15, 5.6, 0)
+
+
+# Free lenses at 100 and 500 mm, fixed lenses in between and downstream
+def _elements():
+    return [Lens(100, 50, 100), Lens(200, 50, 300), Lens(100, 50, 500), Lens(150, 50, 700)]
+
+
+def _output(elements, changes: dict):
+    elements = list(elements)
+    for i, f in changes.items():
+        elements[i] = Lens(f, elements[i].diameter, elements[i].position)
+    return BeamTrain(elements).propagate(SOURCE)
+
+
+@pytest.mark.parametrize("waist, position", [(4.0, 900), (1.0, 800), (1000.0, 900)])
+def test_two_element_branches_hit_target(waist, position):
+    f_i, f_j = two_element_focal_lengths(SOURCE, _elements(), 0, 2, waist, position)
+    assert f_i.shape == (2,) and np.all(np.isfinite(f_i)) and np.all(np.isfinite(f_j))
+    for a, b in zip(f_i, f_j):
+        output = _output(_elements(), {0: a, 2: b})
+        np.testing.assert_allclose(output.waist, waist, rtol=1e-9)
+        np.testing.assert_allclose(output.waist_position, position, rtol=1e-9)
+
+
+def test_two_element_vectorized_over_targets():
+    f_i, f_j = two_element_focal_lengths(SOURCE, _elements(), 0, 2, [4.0, 1.0], [900, 800])
+    assert f_i.shape == (2, 2)
+    for k, (waist, position) in enumerate([(4.0, 900), (1.0, 800)]):
+        output = _output(_elements(), {0: f_i[0, k], 2: f_j[0, k]})
+        np.testing.assert_allclose([output.waist, output.waist_position], [waist, position], rtol=1e-9)
+
+
+@pytest.mark.parametrize("position", [750, 800, 850])
+def test_focal_length_for_position(position):
+    for f in focal_length_for_position(SOURCE, _elements(), 1, position):
+        np.testing.assert_allclose(_output(_elements(), {1: f}).waist_position, position, rtol=1e-9)
+
+
+@pytest.mark.parametrize("waist", [0.5, 2.0, 10.0])
+def test_focal_length_for_waist(waist):
+    for f in focal_length_for_waist(SOURCE, _elements(), 1, waist):
+        np.testing.assert_allclose(_output(_elements(), {1: f}).waist, waist, rtol=1e-9)
+
+
+def test_unreachable_targets_are_nan():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        # A 0.1 mm waist imaged back onto the lens at 500 mm is smaller than
+        # any spot the lens at 100 mm can form there
+        f_i, f_j = two_element_focal_lengths(SOURCE, _elements(), 0, 2, 0.1, 1300)
+        assert np.all(np.isnan(f_i)) and np.all(np.isnan(f_j))
+        assert np.all(np.isnan(focal_length_for_waist(SOURCE, _elements(), 1, 1000.0)))
+        assert np.all(np.isnan(focal_length_for_position(SOURCE, _elements(), 1, 1000)))
+
+
+def test_mirror_radii_give_focal_lengths():
+    R, r = mirror_radii(500.0, np.pi / 4, 800.0)
+    mirror = ToroidalMirror(R, r, np.pi / 4, 100, 1000)
+    np.testing.assert_allclose([mirror.tangential_focal_length, mirror.sagittal_focal_length], [500.0, 800.0])
@@ -0,0 +1,25 @@
+import os
+
+import numpy as np
+
+from detectors import Detector, total_efficiency
+from efficiency_tables import EfficiencyTable
+
+
+def small_table(root):
+    return EfficiencyTable(3.15, np.linspace(50, 500, 10), [100.0, 200.0], [5.0, 10.0], [2.0, 6.0], root=str(root))
+
+
+def test_table_matches_model_on_grid(tmp_path):
+    table = small_table(tmp_path)
+    expected = total_efficiency(Detector("test", 6.0, 10.0), 3.15, 250.0, 200.0, 6.0)
+    np.testing.assert_allclose(table(250.0, 200.0, 10.0, 6.0), expected)
+    np.testing.assert_allclose(table([250.0], 200.0, 10.0, 6.0), [expected])
+
+
+def test_concurrent_build_leaves_no_tmp(tmp_path):
+    table = small_table(tmp_path)
+    # Another process finished the same table first
+    table._build()
+    assert os.listdir(tmp_path) == [table.version()]
+    assert small_table(tmp_path).path == table.path
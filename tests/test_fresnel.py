@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from fresnel import AngularSpectrumPropagator
+from methods import GaussianBeam, Lens
+
+# Waists of several wavelengths keep the paraxial Gaussian beam close to the
+# exact angular spectrum solution
+
+
+def test_free_space_matches_gaussian_beam():
+    beam = GaussianBeam(3.15, 20, 0)
+    propagator = AngularSpectrumPropagator(3.15, 800.0, 1024)
+    propagator.set_beam(beam, 0)
+    propagator.propagate(3 * beam.zR)
+    assert propagator.overlap(propagator.gaussian_field(beam, 3 * beam.zR)) > 0.99999
+    np.testing.assert_allclose(propagator.power(), 1.0, rtol=1e-9)
+
+
+def test_lens_matches_gaussian_beam():
+    beam = GaussianBeam(3.15, 10, 0)
+    lens = Lens(150, 400, 200)
+    propagator = AngularSpectrumPropagator.for_beamline(beam, [lens], 500)
+    transmission = propagator.run(beam, [lens], 500)
+    assert propagator.overlap(propagator.gaussian_field(lens.transform(beam), 500)) > 0.99999
+    np.testing.assert_allclose(transmission, 1.0, rtol=1e-9)
+
+
+def test_grid_cap_warns():
+    # The simulation.py emitter propagated to 20 m
+    beam = GaussianBeam(3.15, 5.6, 0)
+    elements = [Lens(-33.33, 27, 50), Lens(120, 187, 148)]
+    with pytest.warns(RuntimeWarning, match="capped at 4096"):
+        extent, points = AngularSpectrumPropagator.grid_for(beam, elements, 20000)
+    assert points == 4096
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from methods import GaussianBeam, Lens, ToroidalMirror
+from abcd import propagate_with_gradient
+from optimization import BeamlineOptimizer, with_parameters
+
+SOURCE = GaussianBeam(0.6, 6.2, 0)
+END = 3000.0
+
+# Central difference steps: 1e-3 mm for lengths, 1e-6 rad for angles
+STEPS = {"focal_length": 1e-3, "R": 1e-3, "r": 1e-3, "incidence_angle": 1e-6, "position": 1e-3}
+PARAMETERS = [(0, "focal_length"), (0, "position"), (1, "R"), (1, "r"), (1, "incidence_angle"), (1, "position")]
+
+
+def _elements():
+    return [Lens(400, 100, 500), ToroidalMirror(1309.42, 654.71, np.pi / 4, 100, 1280)]
+
+
+@pytest.mark.parametrize("axis", ["tangential", "sagittal"])
+@pytest.mark.parametrize("j", range(len(PARAMETERS)), ids=[f"{i}-{name}" for i, name in PARAMETERS])
+def test_gradient_matches_finite_differences(axis, j):
+    q_in, dq_in, q, dq = propagate_with_gradient(SOURCE, _elements(), PARAMETERS, axis, END)
+    i, name = PARAMETERS[j]
+    h = STEPS[name]
+    shifted = []
+    for sign in (1, -1):
+        elements = _elements()
+        elements[i] = with_parameters(elements[i], **{name: getattr(elements[i], name) + sign * h})
+        shifted.append(propagate_with_gradient(SOURCE, elements, PARAMETERS, axis, END))
+    np.testing.assert_allclose(dq[j], (shifted[0][2] - shifted[1][2]) / 2 / h, rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(dq_in[:, j], (shifted[0][0] - shifted[1][0]) / 2 / h, rtol=1e-5, atol=1e-6)
+
+
+def test_optimizer_reorders_passing_elements():
+    elements = [Lens(200, 50, 300), Lens(300, 50, 400)]
+    optimizer = BeamlineOptimizer(GaussianBeam(3.15, 5.6, 0), elements, [(0, "position")])
+    # The first lens moved behind the second
+    x = np.array([450.0])
+    assert [e.position for e in optimizer.elements_for(x)] == [400, 450.0]
+    value, gradient = optimizer.transmission_loss(x)
+    h = 1e-3
+    numeric = (optimizer.transmission_loss(x + h)[0] - optimizer.transmission_loss(x - h)[0]) / 2 / h
+    np.testing.assert_allclose(gradient, [numeric], rtol=1e-5)
@@ -0,0 +1,14 @@
+import pytest
+
+from benchmarks import WORKER_MODULES, import_time
+
+# Import time in [s] allowed for a worker module in a fresh interpreter,
+# including NumPy. Loading matplotlib or scipy takes several times longer.
+IMPORT_BUDGET = 0.5
+
+
+@pytest.mark.parametrize("module", WORKER_MODULES)
+def test_worker_import_is_light(module):
+    time, loaded = import_time(module, repeat=3)
+    assert loaded == [], module + " loads " + ", ".join(loaded)
+    assert time < IMPORT_BUDGET
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from methods import GaussianBeam, EllipticalBeam, Lens, ToroidalMirror
+
+SOURCE = GaussianBeam(0.6, 6.2, 0)
+
+
+def test_mirror_focal_lengths():
+    mirror = ToroidalMirror(1200.0, 500.0, np.pi / 3, 100, 1280)
+    np.testing.assert_allclose(mirror.tangential_focal_length, 1200.0 * np.cos(np.pi / 3) / 2)
+    np.testing.assert_allclose(mirror.sagittal_focal_length, 500.0 / 2 / np.cos(np.pi / 3))
+
+
+# Every axis of an astigmatic beam behaves as a circular beam behind a lens
+# with the focal length of that axis
+@pytest.mark.parametrize("waists, positions", [((6.2, 6.2), (0, 0)), ((6.2, 4.0), (0, 150))])
+def test_mirror_transforms_axes_separately(waists, positions):
+    mirror = ToroidalMirror(1200.0, 500.0, np.pi / 3, 100, 1280)
+    beam = EllipticalBeam(0.6, waists[0], waists[1], positions[0], positions[1])
+    output = mirror.transform(beam)
+    for axis, f in enumerate([mirror.tangential_focal_length, mirror.sagittal_focal_length]):
+        expected = Lens(f, 100, 1280).transform(GaussianBeam(0.6, waists[axis], positions[axis]))
+        np.testing.assert_allclose([output.waist[axis], output.waist_position[axis]], [expected.waist, expected.waist_position])
+
+
+def test_stigmatic_polfel_mirror_keeps_beam_circular():
+    # R = 2r at 45 degrees gives equal tangential and sagittal focal lengths
+    mirror = ToroidalMirror(1099.8, 549.9, np.pi / 4, 100, 1280)
+    output = mirror.transform(EllipticalBeam.from_beam(SOURCE))
+    np.testing.assert_allclose(output.ellipticity(np.linspace(1280, 5000, 50)), 1.0)
+    circular = mirror.transform(SOURCE)
+    np.testing.assert_allclose(output.waist, circular.waist)
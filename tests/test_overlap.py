@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from detectors import DETECTORS, convergence_angle
+
+# Focal lengths and optics diameter in [mm] of detector_efficiency.py
+FOCAL_LENGTHS = np.linspace(1, 1000, 1000)
+OPTICS_DIAMETER = 187
+
+
+# The closed form overlap against numerical integration. The tolerance is the
+# discretisation error of the 0.01 degree integration step of overlap_numeric.
+@pytest.mark.parametrize("detector", DETECTORS, ids=lambda d: d.name)
+def test_overlap_matches_numeric(detector):
+    acceptance = detector.acceptance()
+    diameters = convergence_angle(FOCAL_LENGTHS, OPTICS_DIAMETER)
+    overlap = acceptance.overlap(15, diameters)
+    numeric = np.array([acceptance.overlap_numeric(15, d) for d in diameters])
+    np.testing.assert_allclose(overlap, numeric, rtol=2e-3)
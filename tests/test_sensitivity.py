@@ -0,0 +1,35 @@
+import numpy as np
+
+from methods import GaussianBeam, Lens, ToroidalMirror
+from optimization import with_parameters
+from sensitivity import OUTPUTS, jacobian, sensitivity_table
+
+SOURCE = GaussianBeam(0.6, 6.2, 0)
+STEPS = {"focal_length": 1e-3, "R": 1e-3, "r": 1e-3, "incidence_angle": 1e-6, "position": 1e-3}
+
+
+def _elements():
+    return [ToroidalMirror(1099.8, 549.9, np.pi / 4, 100, 1280), Lens(800, 100, 2000),
+            ToroidalMirror(1309.42, 654.71, np.pi / 4, 100, 2380)]
+
+
+def test_jacobian_matches_finite_differences():
+    values, J, parameters = jacobian(SOURCE, _elements())
+    assert J.shape == (len(OUTPUTS), len(parameters))
+    for j, (i, name) in enumerate(parameters):
+        h = STEPS[name]
+        shifted = []
+        for sign in (1, -1):
+            elements = _elements()
+            elements[i] = with_parameters(elements[i], **{name: getattr(elements[i], name) + sign * h})
+            shifted.append(jacobian(SOURCE, elements)[0])
+        np.testing.assert_allclose(J[:, j], (shifted[0] - shifted[1]) / 2 / h, rtol=1e-4, atol=1e-8)
+
+
+def test_table_is_ranked_within_every_output():
+    rows = sensitivity_table(SOURCE, _elements())
+    outputs = [row["output"] for row in rows]
+    assert outputs == sorted(outputs, key=OUTPUTS.index)
+    for output in OUTPUTS:
+        effects = [abs(row["effect"]) for row in rows if row["output"] == output]
+        assert effects == sorted(effects, reverse=True)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from detectors import DETECTORS
+from sweep import COLUMNS, run_sweep
+
+FOCAL_LENGTHS = np.linspace(10, 500, 50)
+
+
+def test_pool_matches_serial():
+    args = (DETECTORS[:2], [100, 187], [1.0, 3.15], FOCAL_LENGTHS)
+    serial = run_sweep(*args, max_workers=1)
+    pool = run_sweep(*args, max_workers=2)
+    assert serial.keys() == pool.keys()
+    for key in serial:
+        np.testing.assert_array_equal(serial[key], pool[key])
+    assert serial["efficiency"].shape == (8, len(FOCAL_LENGTHS))
+
+
+def test_row_holds_optimum_of_its_curve():
+    table = run_sweep(DETECTORS, 187, 3.15, FOCAL_LENGTHS, max_workers=1)
+    index = np.argmax(table["efficiency"], axis=1)
+    np.testing.assert_array_equal(table["best_focal_length"], FOCAL_LENGTHS[index])
+    np.testing.assert_array_equal(table["max_efficiency"], table["efficiency"].max(axis=1))
+
+
+@pytest.mark.parametrize("detectors, diameters, wavelengths", [([], [187], [3.15]), (DETECTORS, [], [3.15]), (DETECTORS, [187], [])])
+def test_empty_grid_gives_empty_table(detectors, diameters, wavelengths):
+    table = run_sweep(detectors, diameters, wavelengths, FOCAL_LENGTHS)
+    for key in COLUMNS:
+        assert len(table[key]) == 0
+    assert table["efficiency"].shape == (0, len(FOCAL_LENGTHS))
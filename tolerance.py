@@ -0,0 +1,111 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from methods import GaussianBeam
+from abcd import element_focal_length
+
+
+class Normal:
+    def __init__(self, sigma: float, mean: float = 0.0):
+        # Standard deviation of the error
+        self.sigma = sigma
+        # Systematic offset of the error
+        self.mean = mean
+
+    def sample(self, rng, size):
+        return rng.normal(self.mean, self.sigma, size)
+
+
+class Uniform:
+    def __init__(self, half_width: float, mean: float = 0.0):
+        # Errors are spread uniformly over mean +- half_width
+        self.half_width = half_width
+        self.mean = mean
+
+    def sample(self, rng, size):
+        return rng.uniform(self.mean - self.half_width, self.mean + self.half_width, size)
+
+
+class ToleranceAnalysis:
+    # Monte Carlo estimate of the spread of the output beam for random element
+    # errors. perturbations maps element index to {parameter: distribution} with
+    # parameters position and focal_length (additive errors in [mm]) and
+    # incidence_angle (additive error in [rad], mirrors only).
+    def __init__(self, source: GaussianBeam, elements: list, perturbations: dict, axis: str = "sagittal"):
+        # Beam incident on the first element
+        self.source = source
+        # Lenses and mirrors ordered by their position in space
+        self.elements = sorted(elements, key=lambda e: e.position)
+        self.perturbations = perturbations
+        # Axis used for mirror focal lengths, "sagittal" as ToroidalMirror.transform
+        self.axis = axis
+        for i, errors in perturbations.items():
+            for name in errors:
+                if name not in ("position", "focal_length", "incidence_angle"):
+                    raise Exception("Unknown perturbed parameter: " + name)
+                if name == "incidence_angle" and not hasattr(self.elements[i], "incidence_angle"):
+                    raise Exception("Only mirrors have an incidence angle.")
+
+    # Element positions and focal lengths in [mm] for a batch of samples, (samples, elements)
+    def sample(self, rng, samples: int):
+        positions = np.tile([e.position for e in self.elements], (samples, 1)).astype(float)
+        focal_lengths = np.tile([element_focal_length(e, self.axis) for e in self.elements], (samples, 1)).astype(float)
+        for i, errors in sorted(self.perturbations.items()):
+            element = self.elements[i]
+            for name, distribution in sorted(errors.items()):
+                error = distribution.sample(rng, samples)
+                if name == "position":
+                    positions[:, i] += error
+                elif name == "focal_length":
+                    focal_lengths[:, i] += error
+                else:
+                    a = element.incidence_angle + error
+                    if self.axis == "tangential":
+                        f = element.R * np.cos(a) / 2
+                    else:
+                        f = element.r / 2 / np.cos(a)
+                    focal_lengths[:, i] += f - element_focal_length(element, self.axis)
+        return positions, focal_lengths
+
+    # Output waist, waist position and cumulative transmission for every sample
+    def evaluate(self, positions, focal_lengths):
+        wavelength = self.source.wavelength
+        diameters = np.array([e.diameter for e in self.elements], dtype=float)
+        q = (positions[:, 0] - self.source.waist_position) + 1j * self.source.zR
+        transmission = np.ones(len(q), dtype=self.source.dtype)
+        for k in range(positions.shape[1]):
+            if k > 0:
+                q = q + positions[:, k] - positions[:, k - 1]
+            w2 = wavelength * np.abs(q) ** 2 / np.pi / np.imag(q)
+            transmission *= -np.expm1(-2 * (diameters[k] / 2) ** 2 / w2)
+            f = focal_lengths[:, k]
+            q = q * f / (f - q)
+        return {
+            "waist": np.sqrt(wavelength * np.imag(q) / np.pi),
+            "waist_position": positions[:, -1] - np.real(q),
+            "transmission": transmission,
+        }
+
+    def _run_batch(self, job):
+        seed, samples = job
+        rng = np.random.default_rng(seed)
+        return self.evaluate(*self.sample(rng, samples))
+
+    # Propagate samples in vectorized batches. Every batch has its own random
+    # stream spawned from seed, so results do not depend on max_workers.
+    # max_workers=1 runs all batches in this process.
+    def run(self, samples: int, seed: int = 0, batch_size: int = 10**5, max_workers: int = 1):
+        sizes = [min(batch_size, samples - i) for i in range(0, samples, batch_size)]
+        jobs = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+        if max_workers == 1:
+            batches = [self._run_batch(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                batches = list(executor.map(self._run_batch, jobs))
+        return {key: np.concatenate([batch[key] for batch in batches]) for key in batches[0]}
+
+
+# Percentiles of every result of ToleranceAnalysis.run
+def percentiles(results: dict, q=(5, 50, 95)):
+    return {key: np.percentile(values, q) for key, values in results.items()}
@@ -1,6 +1,7 @@
 import numpy as np
 
-from methods import GaussianBeam, Lens, Plotter, ToroidalMirror
+from methods import GaussianBeam, Lens, ToroidalMirror
+from plotting import Plotter
 
 wavelength = 0.6 # mm (500 GHz)
 # zR = 204 mm
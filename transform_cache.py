@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Hashable description of an element or beam from its type and attributes
+def _key(obj):
+    items = []
+    for name, value in sorted(vars(obj).items()):
+        if isinstance(value, np.ndarray):
+            value = (value.dtype.str, value.shape, value.tobytes())
+        elif isinstance(value, np.generic):
+            value = value.item()
+        items.append((name, value))
+    return (type(obj).__name__, tuple(items))
+
+
+class TransformCache:
+    # Bounded LRU cache of element transforms keyed by (element parameters,
+    # input beam parameters). Cached beams are shared between callers and
+    # must not be modified.
+    def __init__(self, maxsize: int = 1024):
+        # Maximum number of cached transforms
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def transform(self, element, beam):
+        key = (_key(element), _key(beam))
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        self.misses += 1
+        output = element.transform(beam)
+        self._cache[key] = output
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return output
+
+    # Beams in every segment of a chain of elements: the input beam followed by
+    # the beam after each element. Only stages whose element or input changed
+    # are evaluated again.
+    def propagate(self, elements: list, beam):
+        beams = [beam]
+        for element in sorted(elements, key=lambda e: e.position):
+            beams.append(self.transform(element, beams[-1]))
+        return beams
+
+    def clear(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "maxsize": self.maxsize}